@@ -1,279 +1,88 @@
-import json 
-import os
+from __future__ import annotations
+
 from datetime import date, datetime
 import calendar
-import random
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
+from typing import TYPE_CHECKING
 import streamlit as st
 
+#pandas, matplotlib (charts) and finance_core are imported inside the pages that use them,
+#so About and To Take & To Give start a worker without loading either
+from profiling import PROFILE_HISTORY, begin_rerun, end_rerun, profiled, remember, stage, stop_tracing
+from tips import get_random_tips
 
+from storage import (
+    USERS_DIR,
+    archive_summaries,
+    cache_stats,
+    combine_summaries,
+    current_ledger,
+    get_current_month_key,
+    import_transactions,
+    list_archive_months,
+    load_archive_month,
+    load_data,
+    new_record_id,
+    person_key,
+    record_change,
+    record_map,
+    rollover_month_if_needed,
+    summarize_month,
+    use_ledger,
+    write_stats,
+)
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-st.set_page_config(page_title="Student Monthly Allowance Tracker",page_icon="💰",layout="wide",)
 
-DATA_FILE = "finance_data.json"  #Main data file 
-
-
-def get_current_month_key() -> str:
-    """Return the current month in 'YYYY-MM' format, used as a key in JSON."""
-    today = date.today()
-    return f"{today.year:04d}-{today.month:02d}"
-
-def load_data():
-        if not os.path.exists(DATA_FILE):
-        # Initial default states
-            return {
-                "current_month": get_current_month_key(),
-                "monthly_allowance": 0.0,
-                "categories": [
-                    "Food",
-                    "Transport",
-                    "Rent / Hostel",
-                    "Groceries",
-                    "Entertainment",
-                    "Academic",
-                    "Health",
-                    "Savings",
-                    "Miscellaneous",
-                ],
-                "transactions": [],  # List of dicts
-                "archives": {},  # "YYYY-MM": {monthly_allowance, transactions}
-                "savings_goals": [],  # List of savings goal dicts: {id, name, target_amount, target_date, created_date}
-                "to_take": [],  # Money friends owe you: {id, person, amount, description, date}
-                "to_give": [],  # Money you owe friends: {id, person, amount, description, date}
-            }
-
-        try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, OSError):
-            # If file is corrupted, fall back to default structure
-            return {
-                "current_month": get_current_month_key(),
-                "monthly_allowance": 0.0,
-                "categories": [],
-                "transactions": [],
-                "archives": {},
-                "savings_goals": [],
-                "to_take": [],
-                "to_give": [],
-            }
-
-        # Ensure required keys exist even if file is old
-        data.setdefault("current_month", get_current_month_key())
-        data.setdefault("monthly_allowance", 0.0)
-        data.setdefault("categories", [])
-        data.setdefault("transactions", [])
-        data.setdefault("archives", {})
-        data.setdefault("savings_goals", [])
-        data.setdefault("to_take", [])
-        data.setdefault("to_give", [])
-        return data
-
-
-def save_data(data: dict) -> None:
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-
-def rollover_month_if_needed(data: dict) -> dict:
-
-    today_month = get_current_month_key()
-    stored_month = data.get("current_month", today_month)
-
-    if stored_month != today_month:
-        # Archive previous month data under its month key
-        previous_month_key = stored_month
-        # Only archive if there is anything meaningful
-        if data.get("transactions") or data.get("monthly_allowance", 0) != 0:
-            data["archives"][previous_month_key] = {
-                "monthly_allowance": data.get("monthly_allowance", 0.0),
-                "transactions": data.get("transactions", []),
-            }
-
-        # Start a new month, keeping the same categories and allowance
-        data["current_month"] = today_month
-        data["transactions"] = []
-
-        # Persist change immediately so that refreshes see the new month
-        save_data(data)
-
-    return data
-
-
-def compute_basic_metrics(df: pd.DataFrame, monthly_allowance: float) -> dict:
-#totals and derived metrics for dashboard
-    if df.empty:
-        transaction_income = 0.0
-        total_expense = 0.0
-    else:
-        transaction_income = df.loc[df["income_or_expenditure"] == "Income", "amount"].sum()
-        total_expense = df.loc[df["income_or_expenditure"] == "Expenditure", "amount"].sum()
+DEBT_PAGE_SIZE = 20  #Entries per page on To Take & To Give
 
-    # Monthly allowance is considered as income
-    total_income = monthly_allowance + transaction_income
-    
-    # Remaining budget = total income (allowance + transactions) - expenses
-    net_available = total_income - total_expense
 
-    return {
-        "total_income": float(total_income),  # Includes monthly allowance
-        "total_expense": float(total_expense),
-        "net_available": float(net_available),
-        "remaining_budget": float(max(net_available, 0.0)),  # Do not show negative as remaining
-    }
 
 
-def transactions_to_dataframe(transactions: list) -> pd.DataFrame:
-#Convert list to dataframe
-    if not transactions:
-        return pd.DataFrame(columns=["date", "category", "income_or_expenditure", "payment_mode", "amount"])
+st.set_page_config(page_title="Student Monthly Allowance Tracker",page_icon="💰",layout="wide",)
 
-    df = pd.DataFrame(transactions)
-    # Parse date to datetime for grouping and sorting
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
-    return df
 
+def current_month_key(data: dict) -> tuple:
+    #Cache key of this month's frame and of everything derived from it
+    return ("current", current_ledger(), data.get("current_month"), data.get("version", 0))
 
-def get_days_in_current_month() -> int:
-    today = date.today()
-    return calendar.monthrange(today.year, today.month)[1]
 
+@profiled()
+def current_month_frame(data: dict) -> pd.DataFrame:
+    #Typed frame of this month's transactions, built once per ledger version and shared by all pages
+    from finance_core import ledger_frame
 
-def compute_insight_metrics(metrics: dict) -> dict:
-    """
-   metrics for Insights page:
-    - average daily spending so far
-    - remaining days
-    - safe daily spending limit
-    """
-    today = date.today()
-    days_in_month = get_days_in_current_month()
-    days_passed = today.day  # Up to and including today
-    remaining_days = max(days_in_month - days_passed, 0)
-
-    total_expense = metrics["total_expense"]
-    remaining_budget = metrics["remaining_budget"]
-
-    avg_daily_spent = total_expense / days_passed if days_passed > 0 else 0.0
-    safe_daily_spend = remaining_budget / remaining_days if remaining_days > 0 else 0.0
-
-    return {
-        "avg_daily_spent": float(avg_daily_spent),
-        "remaining_days": int(remaining_days),
-        "safe_daily_spend": float(safe_daily_spend),
-    }
-
-
-
-
-
-#Financial tips system
-FINANCIAL_TIPS = [
-    "Note your expenses once a day to stay calmly aware.",
-    "Keep small, predictable snacks at home to avoid impulse buys outside.",
-    "Plan your week’s meals so food spending feels intentional.",
-    "Refill a water bottle instead of buying bottles on campus.",
-    "Use a simple spending limit for outings and stick to it comfortably.",
-    "Share subscriptions with trusted friends where allowed to reduce cost.",
-    "Schedule a weekly ‘money check-in’ that takes just 5–10 minutes.",
-    "Walk or cycle for short distances when it feels safe and practical.",
-    "Use a shopping list so you only buy what you had in mind.",
-    "Keep one low-cost comfort activity ready for stressful days.",
-    "Borrow books from the library before buying new ones.",
-    "Cook in bulk with friends and share ingredients to save gently.",
-    "Track how often you order food; small changes can add up calmly.",
-    "Keep a small emergency cushion, even if it grows slowly.",
-    "If you overspend one day, you can gently rebalance over the week.",
-    "Look for student discounts before paying full price.",
-    "Bring homemade tea or coffee when possible to reduce café trips.",
-    "Compare prices online before buying electronics or textbooks.",
-    "Set a simple monthly savings goal, even if the amount is small.",
-    "Write down your top three spending priorities for this month.",
-    "Plan social outings that don’t always revolve around spending.",
-    "Buy second-hand when it feels comfortable for you.",
-    "Use cash for some categories if it helps you feel more in control.",
-    "Pause for a few seconds before each unplanned purchase.",
-    "Unsubscribe from marketing emails that tempt you to buy more.",
-    "Set gentle limits for late-night online shopping.",
-    "Review your recurring subscriptions once a month.",
-    "Use a shared ride instead of solo cabs when it feels safe.",
-    "Try a ‘no-spend’ day occasionally to reset your habits.",
-    "Keep snacks in your bag to avoid expensive last-minute buys.",
-    "Plan ahead for exam periods when delivery spending might rise.",
-    "Split big purchases into planned, smaller monthly amounts.",
-    "Try making coffee at home most days and buying it occasionally.",
-    "Notice which days you tend to spend more, and plan ahead.",
-    "Set a calm limit for how often you use food delivery apps.",
-    "Use your allowance tracking as information, not as judgment.",
-    "Compare prices between nearby stores for everyday items.",
-    "Keep one payment method as your primary one to simplify tracking.",
-    "Add notes to your transactions so they make sense later.",
-    "Create a small ‘fun fund’ so enjoyment is part of your budget.",
-    "When you get extra income, decide its purpose before spending.",
-    "Try generic brands for a few items and see how you feel.",
-    "Keep a list of things you want and revisit it after a few days.",
-    "Celebrate small wins like sticking to your plan for a week.",
-    "If a plan doesn’t work, adjust it rather than abandoning it.",
-    "Use reminders to pay any dues on time and avoid late fees.",
-    "Talk openly with friends about low-cost hangout ideas.",
-    "Bundle small online orders to reduce delivery fees.",
-    "Prepare simple meals in advance for busy days.",
-    "Notice which purchases actually make you feel better long term.",
-    "Use campus resources (labs, gyms, libraries) wherever possible.",
-    "Take advantage of student offers on transport passes if available.",
-    "Write down upcoming events so you can plan their costs calmly.",
-    "Keep your most common categories visible to stay mindful.",
-    "Review last month’s spending for 5 minutes to spot easy tweaks.",
-    "Use your allowance tracker as a supportive tool, not a critic.",
-    "Choose one category to gently reduce this month, not all at once.",
-    "Make a simple meal plan before grocery shopping.",
-    "Avoid shopping when you’re very tired or stressed if possible.",
-    "Track cash withdrawals so you know where they are going.",
-    "Use campus printers or shared printers to save on printing costs.",
-    "Sell or donate items you don’t use and free up space and money.",
-    "When you get a gift or bonus, consider saving a small part of it.",
-    "Choose one day a week to quickly log all pending transactions.",
-    "Staying curious about your habits is more helpful than being harsh.",
-    "Ask seniors how they managed their allowance for practical ideas.",
-    "Keep big financial goals visible but flexible.",
-    "Reflect on one purchase each week that felt really worth it.",
-    "Reflect on one purchase each week that you might skip next time.",
-    "Use a simple color scheme and calm visuals for your money tools.",
-    "Give yourself permission to enjoy your allowance mindfully.",
-    "Remember that small, steady changes often beat strict rules.",
-    "Revisit your budget if your routine or semester changes.",
-    "Use this tracker to reduce surprise, not to create pressure.",
-    "Notice which subscriptions you actually use regularly.",
-    "Group similar expenses together to see clear patterns.",
-    "Set a friendly reminder near your study space to check your budget.",
-    "Track how often you take cabs versus public transport.",
-    "Plan ahead for festivals and celebrations in your budget.",
-    "Aim for progress in your financial habits, not perfection.",
-    "If you miss tracking for a few days, you can always restart calmly.",
-    "Use digital wallets mindfully; small taps can add up quietly.",
-    "Recheck your allowance amount each semester to see if it still fits.",
-    "Keep your financial notes simple enough that you enjoy using them.",
-]
-
-
-def get_random_tips(n: int = 3) -> list:
-    n = min(n, len(FINANCIAL_TIPS))
-    return random.sample(FINANCIAL_TIPS, n)
+    return ledger_frame(data.get("transactions", []), current_month_key(data))
 
 
 
 
 
+def show_chart(kind: str, spec: dict) -> None:
+    #Draw (or reuse) a cached chart image and note how long it took
+    from charts import render_chart
 
+    with stage("render_chart"):
+        rendered = render_chart(kind, spec)
+    show_rendered_chart(rendered)
 
 
+def show_rendered_chart(rendered: tuple) -> None:
+    #Show a render_chart() result (png, elapsed_ms, from_cache) with its render time
+    png, elapsed_ms, from_cache = rendered
+    with stage("st.image"):
+        st.image(png, use_container_width=True)
+    st.caption(f"{'Cached chart' if from_cache else 'Rendered'} in {elapsed_ms:.1f} ms")
 
 
 def render_dashboard(data: dict) -> None:
     #main dashboard
+    from finance_core import (
+        TABLE_SORTS, compute_basic_metrics, days_to_datetime, frame_for_display, frame_orders, transaction_page,
+    )
+
     st.subheader("Dashboard - Current Month Overview")
 
     # Allowance settings
@@ -292,12 +101,11 @@ def render_dashboard(data: dict) -> None:
                 step=100.0,
             )
         if st.button("Save Allowance"):
-            data["monthly_allowance"] = float(new_allowance)
-            save_data(data)
+            record_change(data, "set", "monthly_allowance", float(new_allowance))
             st.success("Monthly allowance saved. You can adjust this anytime.")
 
     # Convert current transactions to DataFrame
-    df = transactions_to_dataframe(data.get("transactions", []))
+    df = current_month_frame(data)
     basic_metrics = compute_basic_metrics(df, data.get("monthly_allowance", 0.0))
 
     #Key metrics
@@ -348,14 +156,14 @@ def render_dashboard(data: dict) -> None:
                 st.warning("Please enter an amount greater than zero.")
             else:
                 new_tx = {
+                    "id": new_record_id(),
                     "date": tx_date.isoformat(),
                     "category": category,
                     "income_or_expenditure": income_or_exp,
                     "payment_mode": payment_mode,
                     "amount": float(amount),
                 }
-                data.setdefault("transactions", []).append(new_tx)
-                save_data(data)
+                record_change(data, "append", "transactions", new_tx)
                 st.success("Transaction added. You're keeping a clear, calm record.")
 
     #Category management
@@ -371,8 +179,7 @@ def render_dashboard(data: dict) -> None:
             elif cleaned in data["categories"]:
                 st.info("This category already exists.")
             else:
-                data["categories"].append(cleaned)
-                save_data(data)
+                record_change(data, "append", "categories", cleaned)
                 st.success("Category added and saved for future use.")
 
     with c2:
@@ -383,8 +190,7 @@ def render_dashboard(data: dict) -> None:
                 options=data["categories"],
             )
             if st.button("Delete Selected Categories"):
-                data["categories"] = [c for c in data["categories"] if c not in cats_to_delete]
-                save_data(data)
+                record_change(data, "set", "categories", [c for c in data["categories"] if c not in cats_to_delete])
                 st.success("Selected categories removed. Past transactions remain unchanged.")
         else:
             st.info("No categories defined yet.")
@@ -396,7 +202,7 @@ def render_dashboard(data: dict) -> None:
         return
 
     # Filters
-    f1, f2 = st.columns(2)
+    f1, f2, f3 = st.columns(3)
     with f1:
         type_filter = st.selectbox(
             "Show",
@@ -404,104 +210,110 @@ def render_dashboard(data: dict) -> None:
         )
     with f2:
         sort_option = st.selectbox(
-            "Sort by Amount",
-            options=["None", "Amount Ascending", "Amount Descending"],
+            "Sort by",
+            options=list(TABLE_SORTS),
         )
+    with f3:
+        search = st.text_input("Search", placeholder="Category or payment mode")
+
+    # Filter and sort on pre-sorted row positions; only the visible page is materialised
+    matches = transaction_page(
+        df, frame_orders(df, current_month_key(data)), sort_option,
+        {"Income only": "Income", "Expenditure only": "Expenditure"}.get(type_filter), search,
+        st.session_state.get("transactions_page", 1),
+    )
+    if matches["pages"] > 1:
+        # Fewer pages after a filter change: stay on the last one instead of an empty page
+        st.session_state["transactions_page"] = matches["page"]
+        st.number_input("Page", min_value=1, max_value=matches["pages"], step=1, key="transactions_page")
+    page_df = matches["frame"]
+    if matches["total"] == 0:
+        st.info("No transactions match these filters.")
+        return
+    st.caption(f"Showing {matches['start'] + 1:,}–{matches['start'] + len(page_df):,} of {matches['total']:,} transactions")
 
-    # Apply type filter
-    if type_filter == "Income only":
-        df_filtered = df[df["income_or_expenditure"] == "Income"].copy()
-    elif type_filter == "Expenditure only":
-        df_filtered = df[df["income_or_expenditure"] == "Expenditure"].copy()
-    else:
-        df_filtered = df.copy()
+    # Decode day numbers and categories only for the rows being shown
+    st.dataframe(frame_for_display(page_df), use_container_width=True)
+
+    # Delete transactions section
+    st.markdown("### Delete Transactions")
+    st.write("Select transactions to remove from your records. The list follows the page shown above.")
+
+    # Labels are built column-wise for the current page only and keyed by the transaction's stable id
+    amount_text = page_df["amount"].map("{:.2f}".format)
+    labels = (
+        days_to_datetime(page_df["day"]).dt.strftime("%Y-%m-%d") + " | " + page_df["category"].astype(str) + " | "
+        + page_df["income_or_expenditure"].astype(str) + " | " + amount_text
+    )
+    label_by_id = dict(zip(page_df["id"], labels))
+
+    # Multiselect for choosing transactions to delete
+    ids_to_delete = st.multiselect(
+        "Select transactions to delete",
+        options=list(label_by_id),
+        format_func=label_by_id.get,
+        help="Choose one or more transactions to remove. This action cannot be undone.",
+    )
+
+    if ids_to_delete:
+        if st.button("🗑️ Delete Selected Transactions", type="primary"):
+            before = len(data["transactions"])
+            record_change(data, "delete", "transactions", ids_to_delete)
+            deleted_count = before - len(data["transactions"])
+            st.success(f"Successfully deleted {deleted_count} transaction(s). Your records have been updated.")
+            st.rerun()  # Refresh to show updated table
+
+    # Edit a single transaction in place
+    st.markdown("### Edit a Transaction")
+    edit_id = st.selectbox(
+        "Select a transaction to edit",
+        options=list(label_by_id),
+        format_func=label_by_id.get,
+        index=None,
+        placeholder="Choose a transaction",
+    )
+    if edit_id is not None:
+        tx = record_map(data, "transactions")[edit_id]
+        payment_modes = ["Cash", "Card", "UPI / Wallet", "Bank Transfer", "Other"]
+        categories = list(data.get("categories", []))
+        if tx.get("category") not in categories:
+            categories.append(tx.get("category"))
+        with st.form(f"edit_transaction_{edit_id}"):
+            c1, c2 = st.columns(2)
+            with c1:
+                new_date = st.date_input("Date", value=datetime.fromisoformat(tx["date"]).date())
+                new_type = st.selectbox(
+                    "Type",
+                    options=["Expenditure", "Income"],
+                    index=0 if tx.get("income_or_expenditure") == "Expenditure" else 1,
+                )
+                new_mode = st.selectbox(
+                    "Payment Mode",
+                    options=payment_modes,
+                    index=payment_modes.index(tx["payment_mode"]) if tx.get("payment_mode") in payment_modes else len(payment_modes) - 1,
+                )
+            with c2:
+                new_category = st.selectbox("Category", options=categories, index=categories.index(tx.get("category")))
+                new_amount = st.number_input("Amount", min_value=0.0, value=float(tx.get("amount", 0.0)), step=10.0, format="%.2f")
+
+            if st.form_submit_button("💾 Save Changes"):
+                if new_amount <= 0:
+                    st.warning("Please enter an amount greater than zero.")
+                else:
+                    record_change(data, "update", "transactions", {
+                        **tx,
+                        "date": new_date.isoformat(),
+                        "category": new_category,
+                        "income_or_expenditure": new_type,
+                        "payment_mode": new_mode,
+                        "amount": float(new_amount),
+                    })
+                    st.success("Transaction updated.")
+                    st.rerun()
 
-    # Apply sorting
-    if sort_option == "Amount Ascending":
-        df_filtered = df_filtered.sort_values("amount", ascending=True)
-    elif sort_option == "Amount Descending":
-        df_filtered = df_filtered.sort_values("amount", ascending=False)
-    else:
-        df_filtered = df_filtered.sort_values("date", ascending=True)
 
-    # Format date for display
-    df_filtered["date"] = df_filtered["date"].dt.date
 
-    st.dataframe(df_filtered, use_container_width=True)
 
-    # Delete transactions section
-    st.markdown("### Delete Transactions")
-    st.write("Select transactions to remove from your records.")
-    
-    # Create a list of transaction labels for selection
-    # We'll use the original df (before filtering) to show all transactions
-    df_original = transactions_to_dataframe(data.get("transactions", []))
-    if not df_original.empty:
-        # Create readable labels for each transaction
-        transaction_labels = []
-        transaction_indices = []
-        
-        for idx, row in df_original.iterrows():
-            date_str = pd.to_datetime(row["date"]).strftime("%Y-%m-%d")
-            label = f"{date_str} | {row['category']} | {row['income_or_expenditure']} | {row['amount']:.2f}"
-            transaction_labels.append(label)
-            transaction_indices.append(idx)
-        
-        # Multiselect for choosing transactions to delete
-        transactions_to_delete = st.multiselect(
-            "Select transactions to delete",
-            options=transaction_labels,
-            help="Choose one or more transactions to remove. This action cannot be undone.",
-        )
-        
-        if transactions_to_delete:
-            if st.button("🗑️ Delete Selected Transactions", type="primary"):
-                # Find indices of selected transactions
-                selected_indices = [transaction_indices[i] for i, label in enumerate(transaction_labels) if label in transactions_to_delete]
-                
-                # Remove transactions from the original list
-                # We need to match by the transaction dict, not by DataFrame index
-                transactions_list = data.get("transactions", [])
-                
-                # Convert selected DataFrame rows back to dicts for matching
-                selected_transactions = []
-                for idx in selected_indices:
-                    row = df_original.iloc[idx]
-                    # Reconstruct transaction dict matching the stored format
-                    tx_dict = {
-                        "date": pd.to_datetime(row["date"]).strftime("%Y-%m-%d"),
-                        "category": row["category"],
-                        "income_or_expenditure": row["income_or_expenditure"],
-                        "payment_mode": row["payment_mode"],
-                        "amount": float(row["amount"]),
-                    }
-                    selected_transactions.append(tx_dict)
-                
-                # Remove matching transactions from the list
-                # Use a matching function that compares all fields
-                def transactions_match(tx1, tx2):
-                    """Check if two transaction dicts match."""
-                    return (
-                        tx1.get("date") == tx2.get("date")
-                        and tx1.get("category") == tx2.get("category")
-                        and tx1.get("income_or_expenditure") == tx2.get("income_or_expenditure")
-                        and tx1.get("payment_mode") == tx2.get("payment_mode")
-                        and abs(tx1.get("amount", 0) - tx2.get("amount", 0)) < 0.01  # Float comparison
-                    )
-                
-                # Filter out matching transactions
-                original_count = len(transactions_list)
-                transactions_list = [
-                    tx for tx in transactions_list
-                    if not any(transactions_match(tx, selected_tx) for selected_tx in selected_transactions)
-                ]
-                deleted_count = original_count - len(transactions_list)
-                
-                # Update data and save
-                data["transactions"] = transactions_list
-                save_data(data)
-                st.success(f"Successfully deleted {deleted_count} transaction(s). Your records have been updated.")
-                st.rerun()  # Refresh to show updated table
 
 
 
@@ -513,16 +325,37 @@ def render_dashboard(data: dict) -> None:
 
 
 
+@st.fragment(run_every=1)
+def wait_for_insights(ledger, data: dict) -> None:
+    #Polls while the Insights placeholder is shown and reruns the page once the worker has published
+    from insights import insight_snapshot
 
+    use_ledger(ledger)
+    if insight_snapshot(ledger, data) is not None:
+        st.rerun()
 
 
 def render_insights(data: dict) -> None:
     """Render the Insights tab with analytics, charts, and financial tips."""
+    from insights import insight_snapshot
+
     st.subheader("Insights – Gentle View of Your Habits")
 
-    df = transactions_to_dataframe(data.get("transactions", []))
-    basic_metrics = compute_basic_metrics(df, data.get("monthly_allowance", 0.0))
-    insight_metrics = compute_insight_metrics(basic_metrics)
+    # Figures come precomputed from the background worker; see insights.py
+    with stage("insight_snapshot"):
+        snapshot = insight_snapshot(current_ledger(), data)
+    if snapshot is None:
+        st.info("Working out today's insights in the background. They appear here by themselves in a moment.")
+        wait_for_insights(current_ledger(), data)
+        return
+    basic_metrics = snapshot.basic
+    insight_metrics = snapshot.insight
+    prediction = snapshot.prediction
+    age = snapshot.age_seconds()
+    as_of = f"Figures as of {datetime.fromtimestamp(snapshot.computed_at):%H:%M:%S} ({age:.0f} s ago)"
+    if snapshot.version < data.get("version", 0):
+        as_of += " · your latest changes are still being added"
+    st.caption(as_of)
 
     # --- Spending intelligence section ---
     st.markdown("### Spending Intelligence")
@@ -540,17 +373,44 @@ def render_insights(data: dict) -> None:
     with i3:
         st.metric(
             "Safe Daily Spending Limit (Approx.)",
-            f"{insight_metrics['safe_daily_spend']:,.2f}",
+            f"{(prediction or insight_metrics)['safe_daily_spend']:,.2f}",
         )
+        if prediction and prediction["upcoming_bills"] > 0:
+            st.caption(f"Keeps {prediction['upcoming_bills']:,.2f} aside for regular bills still to come")
 
     st.write(
         "These numbers are estimates to gently guide you. "
         "You can adjust plans at any time to keep things comfortable."
     )
 
+    # --- Forecast section ---
+    st.markdown("### Month-End Forecast")
+    if prediction is None:
+        st.info("A forecast based on your past months appears once your first month has been archived.")
+    else:
+        f1, f2 = st.columns(2)
+        with f1:
+            st.metric("Projected Spending by Month End", f"{prediction['projected_expense']:,.2f}")
+            st.caption(f"Likely between {prediction['lower']:,.2f} and {prediction['upper']:,.2f}")
+        with f2:
+            st.metric("Projected Balance at Month End", f"{basic_metrics['total_income'] - prediction['projected_expense']:,.2f}")
+        with st.expander("Forecast by category"):
+            rows = [
+                {
+                    "Category": row["category"],
+                    "Spent so far": round(row["spent"], 2),
+                    "Still expected": round(row["expected_remaining"], 2),
+                    "Projected": round(row["projected"], 2),
+                    "Regular bill": "yes" if row["scheduled"] else "",
+                }
+                for row in prediction["categories"] if row["projected"] > 0
+            ]
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+
     # --- Visuals section ---
     st.markdown("### Visual Overview")
-    if df.empty:
+    charts = snapshot.charts
+    if not charts:
         st.info("Once you log some transactions, charts will appear here to support your decisions.")
     else:
         col1, col2 = st.columns(2)
@@ -558,52 +418,22 @@ def render_insights(data: dict) -> None:
         # Category-wise pie chart (expenses only)
         with col1:
             st.write("Category-wise Spending (Expenses)")
-            df_exp = df[df["income_or_expenditure"] == "Expenditure"]
-            if df_exp.empty:
+            if "category" not in charts:
                 st.info("No expenditure entries yet for this month.")
             else:
-                category_sums = df_exp.groupby("category")["amount"].sum().sort_values(ascending=False)
-                fig, ax = plt.subplots()
-                # Use calm, non-red colors
-                colors = plt.cm.Pastel2.colors
-                ax.pie(
-                    category_sums.values,
-                    labels=category_sums.index,
-                    autopct="%1.1f%%",
-                    startangle=90,
-                    colors=colors,
-                )
-                ax.axis("equal")
-                st.pyplot(fig)
+                show_rendered_chart(charts["category"])
 
         # Daily spending trend (expenses only)
         with col2:
             st.write("Daily Spending Trend (Expenses)")
-            df_exp = df[df["income_or_expenditure"] == "Expenditure"]
-            if df_exp.empty:
+            if "daily" not in charts:
                 st.info("No expenditure entries yet for this month.")
             else:
-                daily = df_exp.groupby("date")["amount"].sum().reset_index()
-                daily = daily.sort_values("date")
-                fig, ax = plt.subplots()
-                ax.plot(daily["date"], daily["amount"], marker="o", color="#4c72b0")
-                ax.set_xlabel("Date")
-                ax.set_ylabel("Amount")
-                ax.set_title("Daily Expenditure")
-                plt.xticks(rotation=45)
-                st.pyplot(fig)
+                show_rendered_chart(charts["daily"])
 
         # Income vs Expenditure comparison
         st.write("Income vs Expenditure This Month")
-        total_income = basic_metrics["total_income"]
-        total_expense = basic_metrics["total_expense"]
-        fig, ax = plt.subplots()
-        labels = ["Income", "Expenditure"]
-        values = [total_income, total_expense]
-        colors = ["#55a868", "#4c72b0"]  # Calm green and blue
-        ax.bar(labels, values, color=colors)
-        ax.set_ylabel("Amount")
-        st.pyplot(fig)
+        show_rendered_chart(charts["income_vs_expense"])
 
     # --- Financial tips section ---
     st.markdown("### Gentle Financial Tips for Students")
@@ -629,8 +459,94 @@ def render_insights(data: dict) -> None:
 
 
 
+def render_trends(data: dict) -> None:
+    #Multi-month trends built from the month summary index plus the current month
+    import pandas as pd
+    from finance_core import TREND_WINDOWS, compute_trends
+
+    st.subheader("Trends – How Your Months Compare")
+
+    summaries = archive_summaries(data)
+    summaries[data.get("current_month", get_current_month_key())] = summarize_month(
+        data.get("monthly_allowance", 0.0), data.get("transactions", [])
+    )
+    if len(summaries) < 2:
+        st.info("Trends appear once at least one previous month has been archived.")
+        return
+
+    trends = compute_trends(summaries)
+    totals = trends["totals"]
+    categories = trends["categories"]
+    labels = [str(month) for month in totals.index]
+
+    # --- Month over month ---
+    st.markdown("### This Month vs Last Month")
+    latest, previous = totals.iloc[-1], totals.iloc[-2]
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.metric("Spending", f"{latest['expense']:,.2f}",
+                  None if pd.isna(latest["expense_delta"]) else f"{latest['expense_delta']:+,.2f}", delta_color="inverse")
+    with c2:
+        st.metric("Net", f"{latest['net']:,.2f}",
+                  None if pd.isna(previous["net"]) else f"{latest['net'] - previous['net']:+,.2f}")
+    with c3:
+        st.metric("Savings Rate", "–" if pd.isna(latest["savings_rate"]) else f"{latest['savings_rate']:.1f}%")
+
+    # --- Totals over time ---
+    st.markdown("### Income, Spending and Net by Month")
+    show_chart("lines", {
+        "x": labels,
+        "series": [
+            {"label": "Income", "values": totals["income"].tolist(), "color": "#55a868"},
+            {"label": "Spending", "values": totals["expense"].tolist(), "color": "#4c72b0"},
+            {"label": "Net", "values": totals["net"].tolist(), "color": "#8172b2"},
+        ],
+        "ylabel": "Amount",
+        "figsize": [10, 4],
+    })
+
+    st.markdown("### Savings Rate Over Time")
+    show_chart("lines", {
+        "x": labels,
+        "series": [{"label": "Savings rate (% of allowance)", "values": totals["savings_rate"].tolist(), "color": "#55a868"}],
+        "ylabel": "%",
+        "figsize": [10, 3],
+    })
+
+    # --- Rolling category averages ---
+    st.markdown("### Category Averages")
+    spending_columns = [c for c in categories.columns if not c.endswith(tuple(f" avg{w}" for w in TREND_WINDOWS))]
+    if not spending_columns:
+        st.info("No spending recorded yet.")
+    else:
+        last = categories.iloc[-1]
+        table = pd.DataFrame({
+            "This month": last[spending_columns].to_numpy(),
+            **{f"{w}-month avg": last[[f"{c} avg{w}" for c in spending_columns]].to_numpy() for w in TREND_WINDOWS},
+        }, index=spending_columns)
+        table["vs 3-month avg"] = table["This month"] - table["3-month avg"]
+        st.dataframe(table.round(2), use_container_width=True)
+
+        top = spending_columns[:5]
+        window = TREND_WINDOWS[0]
+        show_chart("lines", {
+            "x": labels,
+            "series": [{"label": c, "values": categories[f"{c} avg{window}"].tolist()} for c in top],
+            "ylabel": f"{window}-month average spending",
+            "figsize": [10, 4],
+        })
+
+    # --- Month-by-month table ---
+    st.markdown("### Month by Month")
+    history = totals[["income", "expense", "net", "savings_rate", "expense_delta", "expense_change"]].iloc[::-1]
+    history.index = history.index.astype(str)
+    st.dataframe(history.round(2), use_container_width=True)
+
+
 def render_savings(data: dict) -> None:
    #Render the Savings tab with goal tracking and progress visualization
+    from finance_core import compute_savings, goal_progress, savings_timeline
+
     st.subheader("Monthly Savings Goals – Your Path to Financial Growth")
     
     st.write(
@@ -640,20 +556,14 @@ def render_savings(data: dict) -> None:
     
     # Calculate current savings from transactions
     # Monthly allowance is treated as income
-    df = transactions_to_dataframe(data.get("transactions", []))
-    monthly_allowance = data.get("monthly_allowance", 0.0)
-    
-    if df.empty:
-        transaction_income = 0.0
-        total_expense = 0.0
-    else:
-        transaction_income = df.loc[df["income_or_expenditure"] == "Income", "amount"].sum()
-        total_expense = df.loc[df["income_or_expenditure"] == "Expenditure", "amount"].sum()
-    
-    # Total income includes monthly allowance + transaction income
-    total_income = monthly_allowance + transaction_income
-    # Savings = total income (allowance + transactions) - expenses
-    current_savings = float(total_income - total_expense)
+    df = current_month_frame(data)
+    savings = compute_savings(df, data.get("monthly_allowance", 0.0))
+    current_savings = savings["current_savings"]
+    # Archived days come from the persisted prefix, so goals can span months
+    timeline = savings_timeline(
+        data.get("savings_prefix"), data.get("current_month", get_current_month_key()), df,
+        data.get("monthly_allowance", 0.0), ("savings", current_ledger(), data.get("current_month"), data.get("version", 0)),
+    )
     
     # Show current savings status
     st.markdown("### Current Savings Status")
@@ -661,10 +571,8 @@ def render_savings(data: dict) -> None:
     with col1:
         st.metric("Current Month Savings", f"{current_savings:,.2f}")
     with col2:
-        monthly_allowance = data.get("monthly_allowance", 0.0)
-        if monthly_allowance > 0:
-            savings_rate = (current_savings / monthly_allowance * 100) if monthly_allowance > 0 else 0.0
-            st.metric("Savings Rate (of Allowance)", f"{savings_rate:.1f}%")
+        if savings["savings_rate"] is not None:
+            st.metric("Savings Rate (of Allowance)", f"{savings['savings_rate']:.1f}%")
         else:
             st.info("Set your monthly allowance in Dashboard to see savings rate.")
     
@@ -681,17 +589,11 @@ def render_savings(data: dict) -> None:
             # Get today's date
             today = date.today()
 
-            # Calculate the last day of the current month
-            last_day = calendar.monthrange(today.year, today.month)[1]
-            max_date = date(today.year, today.month, last_day)
-
-            # The updated input line
             target_date = st.date_input(
                 "Target Date", 
                 value=today, 
                 min_value=today, 
-                max_value=max_date,
-                help="Goals must be completed within the current month."
+                help="Goals can span several months; progress counts everything saved from the day the goal is created."
             )
             
             submitted = st.form_submit_button("Create Goal")
@@ -703,18 +605,14 @@ def render_savings(data: dict) -> None:
                 elif target_date is None:
                     st.warning("Please select a target date.")
                 else:
-                    # Generate unique ID for the goal
-                    new_id = str(len(savings_goals) + 1) + "-" + str(int(datetime.now().timestamp()))
+                    # The id is handed out by storage when the goal is saved
                     new_goal = {
-                        "id": new_id,
                         "name": goal_name.strip(),
                         "target_amount": float(target_amount),
                         "target_date": target_date.isoformat(),
                         "created_date": date.today().isoformat(),
                     }
-                    savings_goals.append(new_goal)
-                    data["savings_goals"] = savings_goals
-                    save_data(data)
+                    record_change(data, "append", "savings_goals", new_goal)
                     st.success(f"Goal '{goal_name}' created. You're taking a positive step forward!")
                     st.rerun()
     
@@ -727,31 +625,17 @@ def render_savings(data: dict) -> None:
             "Even small goals help build healthy financial habits."
         )
     else:
-        # Calculate progress for each goal, but only for the current month. In a real app, you might want to track cumulative savings across months.
-        today = date.today()
-        
+        # Progress for each goal counts net savings since its created_date, across months
+        goal_progresses = [goal_progress(goal, timeline) for goal in savings_goals]
         for idx, goal in enumerate(savings_goals):
             goal_id = goal.get("id", str(idx))
             goal_name = goal.get("name", "Unnamed Goal")
-            target_amount = goal.get("target_amount", 0.0)
-            target_date_str = goal.get("target_date", "")
-            created_date_str = goal.get("created_date", date.today().isoformat())
-            
-            try:
-                target_date_obj = datetime.fromisoformat(target_date_str).date()
-            except (ValueError, TypeError):
-                target_date_obj = None
-            
-            # Calculate progress (simplified: use current month savings as progress)
-            # In a real app, you might want cumulative savings across months
-            progress_amount = max(current_savings, 0.0)  # Don't show negative progress
-            progress_percentage = min((progress_amount / target_amount * 100) if target_amount > 0 else 0.0, 100.0)
-            remaining = max(target_amount - progress_amount, 0.0)
-            
-            # Calculate days remaining if target date exists
-            days_remaining = None
-            if target_date_obj:
-                days_remaining = (target_date_obj - today).days
+            progress = goal_progresses[idx]
+            target_amount = progress["target_amount"]
+            progress_amount = progress["progress_amount"]
+            progress_percentage = progress["progress_percentage"]
+            remaining = progress["remaining"]
+            days_remaining = progress["days_remaining"]
             
             # Create a card-like display for each goal
             with st.container():
@@ -773,17 +657,14 @@ def render_savings(data: dict) -> None:
                 
                 with col3:
                     st.metric("Remaining", f"{remaining:,.2f}")
-                    if days_remaining is not None and days_remaining > 0:
-                        # Calculate suggested daily savings
-                        suggested_daily = remaining / days_remaining if days_remaining > 0 else 0.0
-                        st.caption(f"~{suggested_daily:,.2f}/day to reach goal")
+                    if progress["suggested_daily"] is not None:
+                        st.caption(f"~{progress['suggested_daily']:,.2f}/day to reach goal")
                 
                 # Goal actions
                 col_del, col_edit = st.columns([1, 1])
                 with col_del:
                     if st.button(f"Delete Goal", key=f"delete_{goal_id}"):
-                        data["savings_goals"] = [g for g in savings_goals if g.get("id") != goal_id]
-                        save_data(data)
+                        record_change(data, "delete", "savings_goals", [goal_id])
                         st.success(f"Goal '{goal_name}' deleted.")
                         st.rerun()
                 
@@ -794,24 +675,19 @@ def render_savings(data: dict) -> None:
         if len(savings_goals) > 0:
             goal_names = [g.get("name", "Unnamed") for g in savings_goals]
             target_amounts = [g.get("target_amount", 0.0) for g in savings_goals]
-            progress_amounts = [min(current_savings, target) for target in target_amounts]
+            progress_amounts = [min(p["progress_amount"], target) for p, target in zip(goal_progresses, target_amounts)]
             
-            fig, ax = plt.subplots(figsize=(10, 6))
-            x_pos = range(len(goal_names))
-            width = 0.35
-            
-            bars1 = ax.bar([x - width/2 for x in x_pos], target_amounts, width, label="Target", color="#4c72b0", alpha=0.7)
-            bars2 = ax.bar([x + width/2 for x in x_pos], progress_amounts, width, label="Progress", color="#55a868", alpha=0.7)
-            
-            ax.set_xlabel("Goals")
-            ax.set_ylabel("Amount")
-            ax.set_title("Savings Goals Progress")
-            ax.set_xticks(x_pos)
-            ax.set_xticklabels(goal_names, rotation=45, ha="right")
-            ax.legend()
-            
-            plt.tight_layout()
-            st.pyplot(fig)
+            show_chart("grouped_bar", {
+                "labels": goal_names,
+                "series": [
+                    {"label": "Target", "values": target_amounts, "color": "#4c72b0"},
+                    {"label": "Progress", "values": progress_amounts, "color": "#55a868"},
+                ],
+                "xlabel": "Goals",
+                "ylabel": "Amount",
+                "title": "Savings Goals Progress",
+                "figsize": [10, 6],
+            })
     
     st.info(
         "💡 **Tip**: Track your savings regularly and adjust goals as needed. "
@@ -827,9 +703,9 @@ def render_savings(data: dict) -> None:
 
 
 
-def render_csv_analysis() -> None:
+def render_csv_analysis(data: dict) -> None:
   
-    #This does NOT persist data; it only analyzes the uploaded file.
+    #The analysis never persists anything; only the import button at the bottom writes to the ledger.
 
     st.subheader("CSV Analysis – Learn from Past Data")
     st.write(
@@ -843,36 +719,33 @@ def render_csv_analysis() -> None:
         st.info("No file uploaded yet. Choose a file to see insights.")
         return
 
+    from finance_core import summarize_csv_stream
+
     try:
-        df = pd.read_csv(uploaded_file)
+        summary = summarize_csv_stream(uploaded_file)
     except Exception:
         st.warning("Unable to read this file as CSV. Please check the format.")
         return
 
     # Ensure required columns
-    required_cols = {"date", "category", "income_or_expenditure", "payment_mode", "amount"}
-    if not required_cols.issubset(df.columns):
+    if summary["missing_columns"]:
         st.warning(
             "The CSV is missing one or more required columns. "
             "Please ensure it includes: date, category, income_or_expenditure, payment_mode, amount."
         )
-        st.write("Detected columns:", list(df.columns))
+        st.write("Detected columns:", summary["columns"])
         return
 
-    # Normalize dtypes
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
-
     st.markdown("### Raw Data Preview")
-    st.dataframe(df.head(50), use_container_width=True)
+    st.dataframe(summary["preview"], use_container_width=True)
 
     # Basic analytics
-    total_spending = df.loc[df["income_or_expenditure"] == "Expenditure", "amount"].sum()
-    total_income = df.loc[df["income_or_expenditure"] == "Income", "amount"].sum()
+    total_spending = summary["total_spending"]
+    total_income = summary["total_income"]
 
-    if df["date"].notna().any():
-        min_date = df["date"].min().date()
-        max_date = df["date"].max().date()
+    if summary["min_date"] is not None:
+        min_date = summary["min_date"].date()
+        max_date = summary["max_date"].date()
         days_range = max((max_date - min_date).days + 1, 1)
         avg_daily_spent = total_spending / days_range
     else:
@@ -899,49 +772,67 @@ def render_csv_analysis() -> None:
     # Category-wise pie (expenses)
     with col1:
         st.write("Category-wise Spending (Expenses)")
-        df_exp = df[df["income_or_expenditure"] == "Expenditure"]
-        if df_exp.empty:
+        if summary["expense_rows"] == 0:
             st.info("No expenditure entries detected in this file.")
         else:
-            category_sums = df_exp.groupby("category")["amount"].sum().sort_values(ascending=False)
-            fig, ax = plt.subplots()
-            colors = plt.cm.Pastel1.colors
-            ax.pie(
-                category_sums.values,
-                labels=category_sums.index,
-                autopct="%1.1f%%",
-                startangle=90,
-                colors=colors,
-            )
-            ax.axis("equal")
-            st.pyplot(fig)
+            category_sums = summary["category_sums"].sort_values(ascending=False)
+            show_chart("pie", {
+                "labels": [str(c) for c in category_sums.index],
+                "values": [float(v) for v in category_sums.values],
+                "palette": "Pastel1",
+            })
 
     # Daily spending trend
     with col2:
         st.write("Daily Spending Trend (Expenses)")
-        df_exp = df[df["income_or_expenditure"] == "Expenditure"]
-        if df_exp.empty:
+        if summary["expense_rows"] == 0:
             st.info("No expenditure entries detected in this file.")
         else:
-            daily = df_exp.groupby("date")["amount"].sum().reset_index()
+            daily = summary["daily_sums"].rename_axis("date").reset_index(name="amount")
             daily = daily.sort_values("date")
-            fig, ax = plt.subplots()
-            ax.plot(daily["date"], daily["amount"], marker="o", color="#4c72b0")
-            ax.set_xlabel("Date")
-            ax.set_ylabel("Amount")
-            ax.set_title("Daily Expenditure (CSV)")
-            plt.xticks(rotation=45)
-            st.pyplot(fig)
+            show_chart("line", {
+                "x": [d.isoformat() for d in daily["date"]],
+                "x_is_date": True,
+                "y": [float(v) for v in daily["amount"]],
+                "color": "#4c72b0",
+                "xlabel": "Date",
+                "ylabel": "Amount",
+                "title": "Daily Expenditure (CSV)",
+            })
 
     # Income vs Expenditure comparison
     st.write("Income vs Expenditure (CSV)")
-    fig, ax = plt.subplots()
-    labels = ["Income", "Expenditure"]
-    values = [total_income, total_spending]
-    colors = ["#55a868", "#4c72b0"]
-    ax.bar(labels, values, color=colors)
-    ax.set_ylabel("Amount")
-    st.pyplot(fig)
+    show_chart("bar", {
+        "labels": ["Income", "Expenditure"],
+        "values": [float(total_income), float(total_spending)],
+        "colors": ["#55a868", "#4c72b0"],
+        "ylabel": "Amount",
+    })
+
+    # Bulk import into the ledger
+    st.markdown("### Import into Your Ledger")
+    st.write(
+        "Add these rows to your records instead of typing them in one by one. "
+        "Each row goes to the month of its date, and rows you already have are skipped, "
+        "so importing the same file again changes nothing."
+    )
+    if st.button("Import Transactions"):
+        from finance_core import csv_transactions
+
+        uploaded_file.seek(0)
+        with stage("csv_transactions"):
+            parsed = csv_transactions(uploaded_file)
+        with stage("import_transactions"):
+            result = import_transactions(data, parsed["transactions"])
+        st.success(
+            f"Imported {result['added']:,} transactions into {len(result['months'])} month(s); "
+            f"skipped {result['duplicates']:,} already in your ledger."
+        )
+        if parsed["invalid_rows"] or result["future"]:
+            st.warning(
+                f"Left out {parsed['invalid_rows']:,} rows without a valid date, amount or type "
+                f"and {result['future']:,} rows dated after the current month."
+            )
 
 
 
@@ -954,47 +845,72 @@ def render_csv_analysis() -> None:
 
 def render_previous_months(data: dict) -> None:
     #Render the Previous Months Data tab with archives and summaries
+    from columnar import archive_columns, build_in_background
+    from finance_core import frame_for_display, ledger_frame
+
     st.subheader("Previous Months Data – Calm Retrospective")
 
-    archives = data.get("archives", {})
-    if not archives:
+    archive_months = list_archive_months(data)
+    if not archive_months:
         st.info("No previous month data archived yet. As months pass, summaries will appear here.")
         return
 
     # Sort month keys descending so latest appears first
-    months = sorted(archives.keys(), reverse=True)
+    months = sorted(archive_months, reverse=True)
     # Show readable labels like "2025-12 (December 2025)"
     def pretty_label(month_key: str) -> str:
         year, month = month_key.split("-")
         month_name = calendar.month_name[int(month)]
         return f"{month_key} ({month_name} {year})"
 
+    # Totals come from the summary index, so nothing here reads archived transactions
+    summaries = archive_summaries(data)
+    overall = combine_summaries(summaries.values())
+    st.markdown(f"### Across {overall['months']} Archived Months")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.metric("Total Income (incl. allowance)", f"{overall['total_income']:,.2f}")
+    with c2:
+        st.metric("Total Spent (Expenses)", f"{overall['total_expense']:,.2f}")
+    with c3:
+        st.metric("Net Over All Months", f"{overall['net']:,.2f}")
+
     label_map = {pretty_label(m): m for m in months}
     selected_label = st.selectbox("Choose a month to explore", options=list(label_map.keys()))
     selected_key = label_map[selected_label]
-
-    month_data = archives[selected_key]
-    df = transactions_to_dataframe(month_data.get("transactions", []))
-    basic_metrics = compute_basic_metrics(df, month_data.get("monthly_allowance", 0.0))
+    summary = summaries.get(selected_key, {})
 
     # Summary metrics
     st.markdown(f"### Summary for {selected_label}")
     c1, c2, c3 = st.columns(3)
     with c1:
-        st.metric("Monthly Allowance (for that month)", f"{month_data.get('monthly_allowance', 0.0):,.2f}")
+        st.metric("Monthly Allowance (for that month)", f"{summary.get('monthly_allowance', 0.0):,.2f}")
     with c2:
-        st.metric("Total Spent (Expenses)", f"{basic_metrics['total_expense']:,.2f}")
+        st.metric("Total Spent (Expenses)", f"{summary.get('total_expense', 0.0):,.2f}")
     with c3:
-        st.metric("Net Remaining at Month End (Approx.)", f"{basic_metrics['remaining_budget']:,.2f}")
+        st.metric("Net Remaining at Month End (Approx.)", f"{max(summary.get('net', 0.0), 0.0):,.2f}")
+    top_categories = sorted(summary.get("category_expense", {}).items(), key=lambda item: item[1], reverse=True)[:3]
+    if top_categories:
+        st.caption("Top spending: " + ", ".join(f"{name} ({amount:,.2f})" for name, amount in top_categories))
+
+    # The selected month is a slice of the memory-mapped archive columns; while they are being built
+    # after an archive change, only that month's partition is read
+    with stage("archive_columns"):
+        columns = archive_columns(data, build=False)
+    if columns is not None:
+        df = columns.frame(selected_key)
+    else:
+        build_in_background(current_ledger(), data)
+        with stage("load_archive_month"):
+            month_data = load_archive_month(data, selected_key)
+        df = ledger_frame(month_data.get("transactions", []), ("archive", current_ledger(), selected_key, data.get("version", 0)))
 
     # Transactions table
     st.markdown("### Transactions for Selected Month")
     if df.empty:
         st.info("No transactions were recorded for this month.")
     else:
-        df_display = df.copy()
-        df_display["date"] = df_display["date"].dt.date
-        st.dataframe(df_display, use_container_width=True)
+        st.dataframe(frame_for_display(df), use_container_width=True)
 
 
 
@@ -1003,6 +919,100 @@ def render_previous_months(data: dict) -> None:
 
 
 
+def markdown_table(columns: dict) -> str:
+    #Markdown table of column name -> values; st.dataframe would pull in pandas and pyarrow, which this page avoids
+    def cell(value) -> str:
+        text = f"{value:,.2f}" if isinstance(value, float) else str(value)
+        for special in "\\`*_[]<>|":
+            text = text.replace(special, "\\" + special)
+        return " ".join(text.split()) or " "
+
+    names = list(columns)
+    lines = ["| " + " | ".join(names) + " |", "|" + "---|" * len(names)]
+    for row in zip(*columns.values()):
+        lines.append("| " + " | ".join(cell(value) for value in row) + " |")
+    return "\n".join(lines)
+
+
+def render_debt_entries(data: dict, key: str, noun: str) -> None:
+    #Paginated list of one side of To Take & To Give; only the chosen entry gets edit widgets
+    entries = data.get(key, [])
+    if not entries:
+        st.info(f"No entries yet. Add entries above to track money {noun}.")
+        return
+
+    balances = data.get("balances", {})
+    people = sorted((p for p in balances if balances[p][key] > 0), key=lambda p: balances[p]["person"].casefold())
+    c1, c2 = st.columns([2, 1])
+    with c1:
+        person = st.selectbox(
+            "Friend", options=[None, *people], key=f"{key}_person",
+            format_func=lambda p: "Everyone" if p is None else balances[p]["person"],
+        )
+
+    # Newest first; filtering by person is the only pass over the whole list
+    visible = entries[::-1] if person is None else [e for e in reversed(entries) if person_key(e.get("person")) == person]
+    page_size = DEBT_PAGE_SIZE
+    pages = max(1, -(-len(visible) // page_size))
+    page = min(max(int(st.session_state.get(f"{key}_page", 1)), 1), pages)
+    if pages > 1:
+        with c2:
+            st.session_state[f"{key}_page"] = page
+            st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    page_entries = visible[(page - 1) * page_size: page * page_size]
+    if not page_entries:
+        st.info("No entries for this friend.")
+        return
+    st.caption(f"Showing {(page - 1) * page_size + 1:,}–{(page - 1) * page_size + len(page_entries):,} of {len(visible):,} entries")
+    st.markdown(markdown_table({
+        "Date": [e.get("date", "") for e in page_entries],
+        "Person": [e.get("person", "Unknown") for e in page_entries],
+        "Amount": [float(e.get("amount", 0.0)) for e in page_entries],
+        "Description": [e.get("description", "") for e in page_entries],
+    }))
+
+    by_id = {e.get("id"): e for e in page_entries if e.get("id")}
+    entry_id = st.selectbox(
+        "Select an entry to edit or delete",
+        options=list(by_id),
+        format_func=lambda i: f"{by_id[i].get('date', '')} | {by_id[i].get('person', 'Unknown')} | {float(by_id[i].get('amount', 0.0)):,.2f}",
+        index=None,
+        placeholder="Choose an entry",
+        key=f"{key}_selected",
+    )
+    if entry_id is None:
+        return
+    entry = record_map(data, key)[entry_id]
+    try:
+        entry_date_obj = datetime.fromisoformat(entry.get("date", "")).date()
+    except (ValueError, TypeError):
+        entry_date_obj = date.today()
+
+    with st.form(f"edit_{key}_form_{entry_id}", clear_on_submit=False):
+        new_person = st.text_input("Person Name", value=entry.get("person", ""))
+        new_amount = st.number_input("Amount", min_value=0.0, value=float(entry.get("amount", 0.0)), step=10.0, format="%.2f")
+        new_description = st.text_area("Description/Notes", value=entry.get("description", ""))
+        new_date = st.date_input("Date", value=entry_date_obj)
+
+        col_save, col_delete = st.columns(2)
+        with col_save:
+            if st.form_submit_button("💾 Save Changes"):
+                record_change(data, "update", key, {
+                    **entry,
+                    "person": new_person.strip(),
+                    "amount": float(new_amount),
+                    "description": new_description.strip(),
+                    "date": new_date.isoformat(),
+                })
+                st.success("Entry updated successfully.")
+                st.rerun()
+        with col_delete:
+            if st.form_submit_button("🗑️ Delete"):
+                record_change(data, "delete", key, [entry_id])
+                st.success(f"Entry for {entry.get('person', 'Unknown')} deleted.")
+                st.rerun()
+
+
 def render_to_take_to_give(data: dict) -> None:
 
     #This is purely for mental records and does NOT affect any financial calculations.
@@ -1014,20 +1024,32 @@ def render_to_take_to_give(data: dict) -> None:
         "This is just for your personal records and doesn't affect your budget calculations."
     )
     
-    to_take = data.get("to_take", [])  # Money owed to you
-    to_give = data.get("to_give", [])  # Money you owe
-    
-    # Calculate totals for quick overview
-    total_to_take = sum(entry.get("amount", 0.0) for entry in to_take)
-    total_to_give = sum(entry.get("amount", 0.0) for entry in to_give)
+    # Totals come from the per-person index, which storage keeps current on every change
+    balances = data.get("balances", {})
+    total_to_take = sum(b["to_take"] for b in balances.values())
+    total_to_give = sum(b["to_give"] for b in balances.values())
     
     # Summary metrics
     st.markdown("### Quick Overview")
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("Total Money to Take", f"{total_to_take:,.2f}")
     with col2:
         st.metric("Total Money to Give", f"{total_to_give:,.2f}")
+    with col3:
+        st.metric("Net Balance", f"{total_to_take - total_to_give:,.2f}")
+
+    # One row per friend: positive net means they owe you overall
+    if balances:
+        st.markdown("### Balance per Friend")
+        people = sorted(balances.values(), key=lambda b: (-abs(b["to_take"] - b["to_give"]), b["person"].casefold()))
+        st.markdown(markdown_table({
+            "Person": [b["person"] for b in people],
+            "To Take": [float(b["to_take"]) for b in people],
+            "To Give": [float(b["to_give"]) for b in people],
+            "Net": [float(b["to_take"] - b["to_give"]) for b in people],
+            "Entries": [b["entries"] for b in people],
+        }))
     
     # Money to Take Section (Friends owe you)
     st.markdown("---")
@@ -1048,85 +1070,18 @@ def render_to_take_to_give(data: dict) -> None:
                 elif amount <= 0:
                     st.warning("Please enter an amount greater than zero.")
                 else:
-                    new_id = str(len(to_take) + len(to_give) + 1) + "-" + str(int(datetime.now().timestamp()))
                     new_entry = {
-                        "id": new_id,
                         "person": person_name.strip(),
                         "amount": float(amount),
                         "description": description.strip() if description else "",
                         "date": entry_date.isoformat(),
                     }
-                    to_take.append(new_entry)
-                    data["to_take"] = to_take
-                    save_data(data)
+                    record_change(data, "append", "to_take", new_entry)
                     st.success(f"Entry added for {person_name}. Your records are updated.")
                     st.rerun()
     
     # Display and manage entries
-    if not to_take:
-        st.info("No entries yet. Add entries above to track money friends owe you.")
-    else:
-        for idx, entry in enumerate(to_take):
-            entry_id = entry.get("id", str(idx))
-            person = entry.get("person", "Unknown")
-            amount = entry.get("amount", 0.0)
-            description = entry.get("description", "")
-            entry_date_str = entry.get("date", date.today().isoformat())
-            
-            try:
-                entry_date_obj = datetime.fromisoformat(entry_date_str).date()
-            except (ValueError, TypeError):
-                entry_date_obj = date.today()
-            
-            with st.container():
-                col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
-                with col1:
-                    st.write(f"**{person}**")
-                    if description:
-                        st.caption(description)
-                    st.caption(f"Date: {entry_date_obj.strftime('%Y-%m-%d')}")
-                with col2:
-                    st.metric("Amount", f"{amount:,.2f}")
-                with col3:
-                    # Edit button
-                    edit_key = f"edit_take_{entry_id}"
-                    if st.button("✏️ Edit", key=edit_key):
-                        st.session_state[f"editing_take_{entry_id}"] = True
-                
-                with col4:
-                    # Delete button
-                    if st.button("🗑️ Delete", key=f"delete_take_{entry_id}"):
-                        data["to_take"] = [e for e in to_take if e.get("id") != entry_id]
-                        save_data(data)
-                        st.success(f"Entry for {person} deleted.")
-                        st.rerun()
-                
-                # Edit form (shown when edit button is clicked)
-                if st.session_state.get(f"editing_take_{entry_id}", False):
-                    with st.form(f"edit_take_form_{entry_id}", clear_on_submit=False):
-                        new_person = st.text_input("Person Name", value=person, key=f"person_take_{entry_id}")
-                        new_amount = st.number_input("Amount", min_value=0.0, value=float(amount), step=10.0, format="%.2f", key=f"amount_take_{entry_id}")
-                        new_description = st.text_area("Description/Notes", value=description, key=f"desc_take_{entry_id}")
-                        new_date = st.date_input("Date", value=entry_date_obj, key=f"date_take_{entry_id}")
-                        
-                        col_save, col_cancel = st.columns(2)
-                        with col_save:
-                            if st.form_submit_button("💾 Save Changes"):
-                                entry["person"] = new_person.strip()
-                                entry["amount"] = float(new_amount)
-                                entry["description"] = new_description.strip()
-                                entry["date"] = new_date.isoformat()
-                                data["to_take"] = to_take
-                                save_data(data)
-                                st.session_state[f"editing_take_{entry_id}"] = False
-                                st.success("Entry updated successfully.")
-                                st.rerun()
-                        with col_cancel:
-                            if st.form_submit_button("❌ Cancel"):
-                                st.session_state[f"editing_take_{entry_id}"] = False
-                                st.rerun()
-                
-                st.divider()
+    render_debt_entries(data, "to_take", "friends owe you")
     
     #Money to Give Section (You owe friends)
     st.markdown("---")
@@ -1147,85 +1102,18 @@ def render_to_take_to_give(data: dict) -> None:
                 elif amount <= 0:
                     st.warning("Please enter an amount greater than zero.")
                 else:
-                    new_id = str(len(to_take) + len(to_give) + 1) + "-" + str(int(datetime.now().timestamp()))
                     new_entry = {
-                        "id": new_id,
                         "person": person_name.strip(),
                         "amount": float(amount),
                         "description": description.strip() if description else "",
                         "date": entry_date.isoformat(),
                     }
-                    to_give.append(new_entry)
-                    data["to_give"] = to_give
-                    save_data(data)
+                    record_change(data, "append", "to_give", new_entry)
                     st.success(f"Entry added for {person_name}. Your records are updated.")
                     st.rerun()
     
     # Display and manage entries
-    if not to_give:
-        st.info("No entries yet. Add entries above to track money you owe friends.")
-    else:
-        for idx, entry in enumerate(to_give):
-            entry_id = entry.get("id", str(idx))
-            person = entry.get("person", "Unknown")
-            amount = entry.get("amount", 0.0)
-            description = entry.get("description", "")
-            entry_date_str = entry.get("date", date.today().isoformat())
-            
-            try:
-                entry_date_obj = datetime.fromisoformat(entry_date_str).date()
-            except (ValueError, TypeError):
-                entry_date_obj = date.today()
-            
-            with st.container():
-                col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
-                with col1:
-                    st.write(f"**{person}**")
-                    if description:
-                        st.caption(description)
-                    st.caption(f"Date: {entry_date_obj.strftime('%Y-%m-%d')}")
-                with col2:
-                    st.metric("Amount", f"{amount:,.2f}")
-                with col3:
-                    # Edit button
-                    edit_key = f"edit_give_{entry_id}"
-                    if st.button("✏️ Edit", key=edit_key):
-                        st.session_state[f"editing_give_{entry_id}"] = True
-                
-                with col4:
-                    # Delete button
-                    if st.button("🗑️ Delete", key=f"delete_give_{entry_id}"):
-                        data["to_give"] = [e for e in to_give if e.get("id") != entry_id]
-                        save_data(data)
-                        st.success(f"Entry for {person} deleted.")
-                        st.rerun()
-                
-                # Edit form (shown when edit button is clicked)
-                if st.session_state.get(f"editing_give_{entry_id}", False):
-                    with st.form(f"edit_give_form_{entry_id}", clear_on_submit=False):
-                        new_person = st.text_input("Person Name", value=person, key=f"person_give_{entry_id}")
-                        new_amount = st.number_input("Amount", min_value=0.0, value=float(amount), step=10.0, format="%.2f", key=f"amount_give_{entry_id}")
-                        new_description = st.text_area("Description/Notes", value=description, key=f"desc_give_{entry_id}")
-                        new_date = st.date_input("Date", value=entry_date_obj, key=f"date_give_{entry_id}")
-                        
-                        col_save, col_cancel = st.columns(2)
-                        with col_save:
-                            if st.form_submit_button("💾 Save Changes"):
-                                entry["person"] = new_person.strip()
-                                entry["amount"] = float(new_amount)
-                                entry["description"] = new_description.strip()
-                                entry["date"] = new_date.isoformat()
-                                data["to_give"] = to_give
-                                save_data(data)
-                                st.session_state[f"editing_give_{entry_id}"] = False
-                                st.success("Entry updated successfully.")
-                                st.rerun()
-                        with col_cancel:
-                            if st.form_submit_button("❌ Cancel"):
-                                st.session_state[f"editing_give_{entry_id}"] = False
-                                st.rerun()
-                
-                st.divider()
+    render_debt_entries(data, "to_give", "you owe friends")
     
     # Note at the bottom
     st.info(
@@ -1278,48 +1166,112 @@ def render_about() -> None:
 
 
 
+def render_profile_panel(container, page: str, runs: list) -> None:
+    #Sidebar debug panel: stage timings of the latest rerun plus the recent history for this page
+    import pandas as pd
+
+    latest = runs[-1]
+    with container.expander(f"Profile: {page} ({latest['total_ms']:.0f} ms)", expanded=False):
+        rows = [
+            {"stage": name, "calls": entry["calls"], "ms": round(entry["ms"], 2), "alloc KiB": round(entry["alloc_kb"], 1)}
+            for name, entry in sorted(latest["stages"].items(), key=lambda item: item[1]["ms"], reverse=True)
+        ]
+        st.dataframe(pd.DataFrame(rows, columns=["stage", "calls", "ms", "alloc KiB"]), hide_index=True, use_container_width=True)
+        totals = [round(run["total_ms"], 1) for run in runs]
+        st.caption(f"Last {len(totals)} reruns (ms): " + ", ".join(str(t) for t in totals))
+        if len(totals) > 1:
+            st.line_chart(pd.DataFrame({"total ms": totals}), height=120)
+
+
+def select_user() -> None:
+    #Multi-user hosting: each session works on its own ledger, chosen once per session
+    user_key = st.session_state.get("user_key") or st.query_params.get("user")
+    if not user_key:
+        st.sidebar.title("Sign in")
+        user_key = st.sidebar.text_input("User name", help="Letters, digits and . _ @ - (up to 64 characters)").strip()
+        if not user_key:
+            st.info("Enter your user name in the sidebar to open your ledger.")
+            st.stop()
+    try:
+        use_ledger(user_key)
+    except ValueError:
+        st.session_state.pop("user_key", None)
+        st.error("User names may only contain letters, digits and . _ @ - (up to 64 characters).")
+        st.stop()
+    st.session_state["user_key"] = user_key
+
+
 def main():
-    
-    
-    data = load_data()
-    data = rollover_month_if_needed(data)
-
-    # Sidebar navigation
-    st.sidebar.title("Navigation")
-    page = st.sidebar.radio(
-        "Go to",
-        options=[
+    if USERS_DIR:
+        select_user()
+    profiling = st.session_state.get("profile_enabled", os.environ.get("FINANCE_PROFILE") == "1")
+    token = begin_rerun() if profiling else None
+    try:
+
+        with stage("load_data"):
+            data = load_data()
+        with stage("rollover_month_if_needed"):
+            data = rollover_month_if_needed(data)
+
+        # Sidebar navigation
+        st.sidebar.title("Navigation")
+        pages = [
             "Dashboard",
             "Insights",
+            "Trends",
             "Savings",
             "CSV Analysis",
             "Previous Months Data",
             "To Take & To Give",
             "About",
-        ],
-        index=0,  #landing page
-    )
-    # Display current month info in sidebar
-    current_month_key = data.get("current_month", get_current_month_key())
-    year, month = current_month_key.split("-")
-    month_name = calendar.month_name[int(month)]
-    st.sidebar.markdown(f"**Current Month:** {month_name} {year}")
-
-    # Route to appropriate page
-    if page == "Dashboard":
-        render_dashboard(data)
-    elif page == "Insights":
-        render_insights(data)
-    elif page == "Savings":
-        render_savings(data)
-    elif page == "CSV Analysis":
-        render_csv_analysis()
-    elif page == "Previous Months Data":
-        render_previous_months(data)
-    elif page == "To Take & To Give":
-        render_to_take_to_give(data)
-    elif page == "About":
-        render_about()
+        ]
+        landing = st.query_params.get("page")  #?page=About opens a page directly
+        page = st.sidebar.radio(
+            "Go to",
+            options=pages,
+            index=pages.index(landing) if landing in pages else 0,  #landing page
+        )
+        # Display current month info in sidebar
+        current_month_key = data.get("current_month", get_current_month_key())
+        year, month = current_month_key.split("-")
+        month_name = calendar.month_name[int(month)]
+        if USERS_DIR:
+            st.sidebar.markdown(f"**User:** {current_ledger()}")
+        st.sidebar.markdown(f"**Current Month:** {month_name} {year}")
+        stats = cache_stats()
+        st.sidebar.caption(f"Ledger cache: {stats['hits']} hits / {stats['misses']} misses")
+        writes = write_stats()
+        st.sidebar.caption(f"Writes: {writes['changes']} changes in {writes['writes']} writes (largest batch {writes['largest_batch']})")
+        st.sidebar.checkbox("Profile reruns", value=profiling, key="profile_enabled")
+        profile_panel = st.sidebar.container()
+
+        # Route to appropriate page
+        if page == "Dashboard":
+            render_dashboard(data)
+        elif page == "Insights":
+            render_insights(data)
+        elif page == "Trends":
+            render_trends(data)
+        elif page == "Savings":
+            render_savings(data)
+        elif page == "CSV Analysis":
+            render_csv_analysis(data)
+        elif page == "Previous Months Data":
+            render_previous_months(data)
+        elif page == "To Take & To Give":
+            render_to_take_to_give(data)
+        elif page == "About":
+            render_about()
+
+        if token is not None:
+            run, token = end_rerun(token), None
+            history = st.session_state.setdefault("profile_history", {})
+            render_profile_panel(profile_panel, page, remember(history, page, run, PROFILE_HISTORY))
+        else:
+            stop_tracing()
+    finally:
+        if token is not None:
+            end_rerun(token)  # st.rerun() or an error cut the profiled rerun short
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+"""
+Benchmarks for the allowance tracker's hot paths.
+
+    python -m benchmarks.run --sizes 100 10000 --months 1 12 --out results.json
+    python -m benchmarks.startup --transactions 1000 --out startup.json
+    python -m benchmarks.tenants --users 1 10 100 500 --out tenants.json
+    python -m benchmarks.compare old.json new.json
+
+synthetic.py builds deterministic ledgers and CSV exports; run.py times each
+function (wall time and tracemalloc peak) and writes machine-readable results;
+startup.py measures each page's first render from a cold process and
+tenants.py rerun latency as the number of hosted users grows.
+"""
@@ -0,0 +1,38 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare old.json new.json --threshold 1.25
+
+Prints the new/old time ratio for every case present in both files and exits
+non-zero if any case got slower than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _index(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)["results"]
+    return {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in results if "seconds" in r}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    old, new = _index(args.old), _index(args.new)
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]["seconds"] / old[key]["seconds"] if old[key]["seconds"] else float("inf")
+        flag = "  REGRESSION" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{key[0]:40s} {key[1]:55s} {ratio:6.2f}x{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Run the benchmark suite and write machine-readable results.
+
+Every case runs against a freshly generated ledger in a scratch directory and
+records the best wall time over --repeat runs plus the tracemalloc peak of one
+extra run. Output:
+
+    {"meta": {"commit": ..., "python": ..., "started": ...},
+     "results": [{"name": ..., "params": {...}, "seconds": ..., "peak_bytes": ...}, ...]}
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import columnar  # noqa: E402
+import storage  # noqa: E402
+from benchmarks.synthetic import generate_ledger, write_csv, write_ledger  # noqa: E402
+from finance_core import (  # noqa: E402
+    compute_basic_metrics, compute_trends, csv_transactions, frame_for_display, frame_orders, goal_progress,
+    savings_timeline, summarize_csv_stream, transaction_page, transactions_to_dataframe,
+)
+from forecast import fit_forecast  # noqa: E402
+
+PAGES = ["Dashboard", "Insights", "Trends", "Savings", "CSV Analysis", "Previous Months Data", "To Take & To Give", "About"]
+
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """Best-of-`repeat` wall time, then one traced run for the allocation peak."""
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        fn(state)
+        timings.append(time.perf_counter() - started)
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        fn(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+
+def _scratch_ledger(workdir: str, transactions: int, months: int, debts: int = 0) -> storage.JsonBackend:
+    #Write a legacy-layout ledger and load it once so archives are partitioned like a real install
+    path = os.path.join(workdir, "finance_data.json")
+    storage.flush_all()  #Buffered changes of the previous scratch ledger must land before its files go
+    for leftover in os.listdir(workdir):
+        target = os.path.join(workdir, leftover)
+        shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+    write_ledger(generate_ledger(transactions, months, storage.get_current_month_key(), debts=debts), path)
+    backend = storage.JsonBackend(path)
+    backend.load()
+    return backend
+
+
+def storage_cases(workdir: str, transactions: int, months: int, repeat: int) -> list:
+    backend = _scratch_ledger(workdir, transactions, months)
+    params = {"transactions": transactions, "archived_months": months}
+    results = []
+
+    def cold_load(_):
+        storage._LOAD_CACHE.clear()
+        backend.load()
+
+    results.append({"name": "load_data.cold", **measure(cold_load, repeat)})
+    results.append({"name": "load_data.cached", **measure(lambda _: backend.load(), repeat)})
+    results.append({"name": "save_data", **measure(lambda data: backend.save(data), repeat, setup=backend.load)})
+
+    # Write-through, so these time the journal write as before write-behind existed
+    through = storage.JsonBackend(backend.data_file, write_behind=0)
+
+    def new_transaction() -> dict:
+        return {"id": storage.new_record_id(), "date": f"{storage.get_current_month_key()}-01", "category": "Food",
+                "income_or_expenditure": "Expenditure", "payment_mode": "Cash", "amount": 1.0}
+
+    results.append({"name": "record_change.append", **measure(
+        lambda data: through.record(data, "append", "transactions", new_transaction()), repeat, setup=through.load)})
+
+    def delete_setup():
+        data = through.load()
+        return data, [t["id"] for t in data["transactions"][:10]]
+
+    results.append({"name": "record_change.delete_10",
+                    **measure(lambda state: through.record(state[0], "delete", "transactions", state[1]), repeat, setup=delete_setup)})
+
+    # A burst of 20 clicks, buffered and then written as one batch
+    def burst(data):
+        for _ in range(20):
+            backend.record(data, "append", "transactions", new_transaction())
+        backend.flush()
+
+    results.append({"name": "record_change.burst_20_buffered", **measure(burst, repeat, setup=backend.load)})
+
+    data = backend.load()
+    everything = list(data["transactions"])
+    for month_key in backend.archive_months(data):
+        everything.extend(backend.load_archive(data, month_key)["transactions"])
+    results.append({"name": "transactions_to_dataframe", **measure(lambda _: transactions_to_dataframe(everything), repeat)})
+
+    df = transactions_to_dataframe(everything)
+    results.append({"name": "compute_basic_metrics", **measure(lambda _: compute_basic_metrics(df, 5000.0), repeat)})
+    results.append({"name": "frame_orders", **measure(lambda _: frame_orders(df), repeat)})
+    orders = frame_orders(df)
+    results.append({"name": "transaction_page", **measure(
+        lambda _: frame_for_display(transaction_page(df, orders, "Amount Descending", "Expenditure", "o", 3)["frame"]), repeat)})
+
+    summaries = dict(data["archive_index"])
+    summaries[data["current_month"]] = storage.summarize_month(data["monthly_allowance"], data["transactions"])
+    results.append({"name": "compute_trends", **measure(lambda _: compute_trends(summaries), repeat)})
+
+    current = transactions_to_dataframe(data["transactions"])
+    results.append({"name": "savings_timeline", **measure(
+        lambda _: savings_timeline(data["savings_prefix"], data["current_month"], current, data["monthly_allowance"]), repeat)})
+    timeline = savings_timeline(data["savings_prefix"], data["current_month"], current, data["monthly_allowance"])
+    goals = [{"target_amount": 1000.0 * (i + 1), "created_date": f"{key}-01", "target_date": "2999-12-31"}
+             for i, key in enumerate(list(data["archive_index"]) + [data["current_month"]])]
+    results.append({"name": "goal_progress.all_goals", **measure(lambda _: [goal_progress(g, timeline) for g in goals], repeat)})
+
+    # Module-level storage calls (which the column store uses) resolve to the scratch ledger from its directory
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        def build_columns(_):
+            columnar._OPEN.clear()
+            shutil.rmtree(storage.archive_columns_dir(), ignore_errors=True)
+            columnar.archive_columns(data)
+
+        results.append({"name": "archive_columns.build", **measure(build_columns, repeat)})
+        results.append({"name": "archive_columns.category_totals", **measure(
+            lambda _: columnar.archive_columns(data).frame().groupby("category", observed=True)["amount"].sum(), repeat)})
+    finally:
+        os.chdir(previous_cwd)
+
+    archived_summaries = dict(data["archive_index"])
+    if archived_summaries:
+        archived = transactions_to_dataframe(everything[len(data["transactions"]):])
+        results.append({"name": "forecast.fit", **measure(lambda _: fit_forecast(archived_summaries, archived), repeat)})
+        model = fit_forecast(archived_summaries, archived)
+        spent = {c: 100.0 for c in model.categories}
+        results.append({"name": "forecast.predict", **measure(lambda _: model.predict(spent, 5000.0), repeat)})
+
+    for result in results:
+        result["params"] = params
+    return results
+
+
+def csv_cases(workdir: str, rows: int, repeat: int) -> list:
+    path = os.path.join(workdir, "export.csv")
+    write_csv(path, rows)
+    result = measure(lambda _: summarize_csv_stream(path), repeat)
+    results = [{"name": "summarize_csv_stream", "params": {"rows": rows}, **result}]
+
+    # First import into an empty ledger, then re-imports that must add nothing
+    rows_to_import = csv_transactions(path)["transactions"]
+    backend = storage.JsonBackend(os.path.join(workdir, "import", storage.DATA_FILE))
+    os.makedirs(os.path.dirname(backend.data_file), exist_ok=True)
+    results.append({"name": "import_transactions.first", "params": {"rows": rows},
+                    **measure(lambda data: backend.import_transactions(data, rows_to_import), 1, setup=backend.load)})
+    results.append({"name": "import_transactions.again", "params": {"rows": rows},
+                    **measure(lambda data: backend.import_transactions(data, rows_to_import), repeat, setup=backend.load)})
+    return results
+
+
+def render_cases(workdir: str, transactions: int, months: int, repeat: int) -> list:
+    """Time each page through Streamlit's headless AppTest."""
+    from streamlit.testing.v1 import AppTest
+
+    _scratch_ledger(workdir, transactions, months)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    try:
+        for page in PAGES:
+            def render(_, page=page):
+                at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600).run()
+                at.sidebar.radio[0].set_value(page).run()
+                if at.exception:
+                    raise RuntimeError(f"{page}: {at.exception[0].value}")
+
+            results.append({
+                "name": f"render.{page}",
+                "params": {"transactions": transactions, "archived_months": months},
+                **measure(render, repeat),
+            })
+    finally:
+        os.chdir(previous_cwd)
+    return results
+
+
+def _append_worker(data_file: str, appends: int, worker: int) -> None:
+    backend = storage.JsonBackend(data_file)
+    data = backend.load()
+    for i in range(appends):
+        backend.record(data, "append", "transactions", {
+            "id": f"w{worker}-{i}", "date": f"{storage.get_current_month_key()}-01", "category": "Food",
+            "income_or_expenditure": "Expenditure", "payment_mode": "Cash", "amount": 1.0,
+        })
+    backend.flush()  #Child processes skip atexit, so write out anything still buffered
+
+
+def concurrency_case(workdir: str, processes: int, appends: int) -> dict:
+    """N processes append at once through stale copies; every transaction must survive."""
+    backend = _scratch_ledger(workdir, 100, 1)
+    before = len(backend.load()["transactions"])
+    started = time.perf_counter()
+    workers = [
+        multiprocessing.Process(target=_append_worker, args=(backend.data_file, appends, w))
+        for w in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    storage._LOAD_CACHE.clear()
+    after = len(backend.load()["transactions"])
+    return {
+        "name": "record_change.concurrent_appends",
+        "params": {"processes": processes, "appends_each": appends},
+        "seconds": elapsed,
+        "lost": before + processes * appends - after,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the allowance tracker's hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000],
+                        help="total transactions per ledger (up to 10_000_000)")
+    parser.add_argument("--months", type=int, nargs="+", default=[1, 12, 120], help="archived months per ledger")
+    parser.add_argument("--csv-rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--render-max", type=int, default=10_000, help="largest ledger rendered through AppTest")
+    parser.add_argument("--processes", type=int, default=8, help="writers in the concurrency check")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    meta = {"commit": _git_commit(), "python": platform.python_version(), "started": datetime.now().isoformat()}
+    results = []
+    workdir = tempfile.mkdtemp(prefix="finance-bench-")
+    try:
+        for size in args.sizes:
+            for months in args.months:
+                results.extend(storage_cases(workdir, size, months, args.repeat))
+                if size <= args.render_max:
+                    results.extend(render_cases(workdir, size, months, 1))
+        for rows in args.csv_rows:
+            results.extend(csv_cases(workdir, rows, args.repeat))
+        results.append(concurrency_case(workdir, args.processes, 50))
+    finally:
+        storage.flush_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    for result in results:
+        timing = f"{result['seconds'] * 1000:10.2f} ms" if "seconds" in result else "   skipped"
+        print(f"{result['name']:40s} {json.dumps(result['params']):55s} {timing}")
+    lost = sum(r.get("lost", 0) for r in results)
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark: time to first render of each page in a fresh process.
+
+    python -m benchmarks.startup --transactions 1000 --months 12 --debts 40 --out startup.json
+
+Every sample is a new interpreter that opens one page directly (?page=...)
+through Streamlit's AppTest, so nothing is warm in sys.modules. Each result
+records the best first-render time, the following rerun time and which heavy
+modules the page pulled in. The ledger has to_take/to_give entries, so the
+To Take & To Give page renders its tables rather than its empty state. The
+file format matches run.py, so benchmarks.compare works on it too.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "pyarrow"]
+
+
+def _child(page: str) -> None:
+    #Runs inside the fresh interpreter; cwd is the scratch ledger directory
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+    at.query_params["page"] = page
+    at.run()
+    first = time.perf_counter() - started
+    if at.exception:
+        raise SystemExit(f"{page}: {at.exception[0].value}")
+    rerun_started = time.perf_counter()
+    at.run()
+    rerun = time.perf_counter() - rerun_started
+    print(json.dumps({
+        "first_render": first,
+        "rerun": rerun,
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def startup_cases(workdir: str, transactions: int, months: int, repeat: int, debts: int = 40) -> list:
+    """Best-of-`repeat` fresh-process first render for every page."""
+    #benchmarks.run imports pandas, so only the parent process may load it
+    from benchmarks.run import PAGES, _scratch_ledger
+
+    _scratch_ledger(workdir, transactions, months, debts)
+    results = []
+    for page in PAGES:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.startup", "--child", page],
+                cwd=workdir, env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True, check=True,
+            )
+            sample = json.loads(out.stdout.strip().splitlines()[-1])
+            sample["process"] = time.perf_counter() - started
+            samples.append(sample)
+        best = min(samples, key=lambda s: s["first_render"])
+        results.append({
+            "name": f"startup.{page}",
+            "params": {"transactions": transactions, "archived_months": months, "debts": debts},
+            "seconds": best["first_render"],
+            "rerun_seconds": min(s["rerun"] for s in samples),
+            "process_seconds": min(s["process"] for s in samples),
+            "heavy_modules": best["heavy_modules"],
+        })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time to first render per page from a cold process")
+    parser.add_argument("--transactions", type=int, default=1_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--debts", type=int, default=40, help="to_take/to_give entries in the ledger")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="startup_results.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child)
+        return 0
+
+    from benchmarks.run import _git_commit
+
+    meta = {"commit": _git_commit(), "python": platform.python_version(), "started": datetime.now().isoformat()}
+    with tempfile.TemporaryDirectory(prefix="finance-startup-") as workdir:
+        results = startup_cases(workdir, args.transactions, args.months, args.repeat, args.debts)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    for result in results:
+        print(f"{result['name']:32s} first {result['seconds'] * 1000:8.1f} ms  rerun {result['rerun_seconds'] * 1000:8.1f} ms"
+              f"  process {result['process_seconds'] * 1000:8.1f} ms  loads {', '.join(result['heavy_modules']) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
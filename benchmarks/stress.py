@@ -0,0 +1,137 @@
+"""
+Concurrent-writer check for the JSON ledger: nothing lost, nothing doubled.
+
+    python -m benchmarks.stress --processes 8 --changes 60
+
+Every process keeps one in-memory copy for its whole run, as a long session
+would, and interleaves buffered transaction appends, deletes of its own
+earlier transactions, explicit flushes and write-through debt entries (counter
+ids). A tiny write-behind batch and compaction threshold make conflicting
+flushes and snapshot rewrites happen constantly.
+
+The ledger starts with legacy transactions that have no ids, so every process
+races to backfill them on its first load, and the backfill and the occasional
+categories change write journal lines far longer than one read of the journal
+tail. Every process must see the same backfilled ids, and its deletes of
+legacy rows must stick.
+
+Afterwards the ledger must hold exactly the transactions that were added or
+backfilled and not deleted, each once, and every debt entry with a distinct
+id. Exits 1 when it does not.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+LEGACY_ROWS = 200  #Id-less transactions the ledger starts with; their backfill is one journal line of ~8 KiB
+
+
+def _transaction(category: str) -> dict:
+    return {
+        "date": f"{storage.get_current_month_key()}-01", "category": category,
+        "income_or_expenditure": "Expenditure", "payment_mode": "Cash", "amount": 1.0,
+    }
+
+
+def _worker(data_file: str, worker: int, changes: int, seed: int, kept) -> None:
+    storage.WRITE_BEHIND_MAX = 3
+    storage.JOURNAL_COMPACT_BYTES = 16384
+    backend = storage.JsonBackend(data_file, write_behind=0.005)
+    rng = random.Random(seed)
+    data = backend.load()
+    legacy = [t["id"] for t in data["transactions"] if t["category"] == "Legacy"]
+    added, deleted = [], []
+    for i in range(changes):
+        roll = rng.random()
+        if roll < 0.05:
+            # One journal line longer than any window the journal tail is read in
+            backend.record(data, "set", "categories", [f"Category {worker}-{i}-{n}" for n in range(300)])
+        elif roll < 0.1 and len(deleted) < len(legacy):
+            deleted.append(rng.choice([i for i in legacy if i not in deleted]))
+            backend.record(data, "delete", "transactions", [deleted[-1]])
+        elif roll < 0.6 or not added:
+            tx_id = f"w{worker}-{i}"
+            backend.record(data, "append", "transactions", {"id": tx_id, **_transaction("Food")})
+            added.append(tx_id)
+        elif roll < 0.75:
+            backend.record(data, "delete", "transactions", [added.pop(rng.randrange(len(added)))])
+        elif roll < 0.9:
+            backend.record(data, "append", "to_take", {"person": f"p{worker}", "amount": 1.0, "description": "", "date": "2026-01-01"})
+        else:
+            backend.flush()
+    backend.flush()  #Child processes skip atexit
+    kept.put((added, legacy, deleted))
+
+
+def stress(processes: int, changes: int, seed: int = 0) -> list:
+    """Run the check in a scratch directory; returns the problems found (empty when none)."""
+    with tempfile.TemporaryDirectory(prefix="finance-stress-") as workdir:
+        data_file = os.path.join(workdir, storage.DATA_FILE)
+        legacy = storage._default_data(list(storage.DEFAULT_CATEGORIES))
+        legacy["transactions"] = [_transaction("Legacy") for _ in range(LEGACY_ROWS)]
+        with open(data_file, "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+        kept = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_worker, args=(data_file, w, changes, seed + w, kept)) for w in range(processes)]
+        for worker in workers:
+            worker.start()
+        expected, backfills, deleted = set(), set(), set()
+        for _ in workers:
+            added, legacy_ids, legacy_deleted = kept.get()
+            expected.update(added)
+            backfills.add(tuple(legacy_ids))
+            deleted.update(legacy_deleted)
+        for worker in workers:
+            worker.join()
+        expected.update(set(next(iter(backfills))) - deleted)
+
+        storage._LOAD_CACHE.clear()
+        data = storage.JsonBackend(data_file, write_behind=0).load()
+        problems = []
+        if len(backfills) > 1:
+            problems.append(f"processes saw {len(backfills)} different sets of backfilled ids")
+        counts = Counter(t["id"] for t in data["transactions"])
+        doubled = sorted(i for i, n in counts.items() if n > 1)
+        missing = sorted(expected - set(counts))
+        unexpected = sorted(set(counts) - expected)
+        if doubled:
+            problems.append(f"{len(doubled)} transactions stored more than once, e.g. {doubled[:5]}")
+        if missing:
+            problems.append(f"{len(missing)} transactions lost, e.g. {missing[:5]}")
+        if unexpected:
+            problems.append(f"{len(unexpected)} deleted transactions came back, e.g. {unexpected[:5]}")
+        debt_ids = Counter(r["id"] for r in data["to_take"])
+        clashes = sorted(i for i, n in debt_ids.items() if n > 1)
+        if clashes:
+            problems.append(f"{len(clashes)} debt entry ids handed out twice, e.g. {clashes[:5]}")
+        return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check concurrent JSON writers for lost or doubled changes")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--changes", type=int, default=60, help="changes per process")
+    parser.add_argument("--rounds", type=int, default=3, help="repetitions with different seeds")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for round_number in range(args.rounds):
+        problems = stress(args.processes, args.changes, seed=round_number * 1000)
+        print(f"round {round_number + 1}: " + ("ok" if not problems else "; ".join(problems)))
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
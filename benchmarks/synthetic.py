@@ -0,0 +1,107 @@
+"""Deterministic synthetic ledgers and CSV exports shaped like the sample data."""
+import csv
+import json
+import random
+from datetime import date, timedelta
+
+CATEGORIES = ["Food", "Transport", "Rent", "Groceries", "Entertainment", "Academic", "Health", "Savings", "Freelance"]
+PAYMENT_MODES = ["Cash", "Card", "UPI / Wallet", "Bank Transfer", "Other"]
+INCOME_CATEGORIES = {"Freelance", "Savings"}
+FRIENDS = ["Asha", "Ravi", "Meera", "Kabir", "Zoya"]
+
+
+def month_keys(end_month: str, count: int) -> list:
+    """`count` consecutive 'YYYY-MM' keys ending with end_month, oldest first."""
+    year, month = (int(part) for part in end_month.split("-"))
+    keys = []
+    for _ in range(count):
+        keys.append(f"{year:04d}-{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(keys))
+
+
+def _transaction(rng: random.Random, month_key: str, with_id: bool) -> dict:
+    year, month = (int(part) for part in month_key.split("-"))
+    category = rng.choice(CATEGORIES)
+    is_income = category in INCOME_CATEGORIES and rng.random() < 0.7
+    tx = {
+        "date": date(year, month, rng.randint(1, 28)).isoformat(),
+        "category": category,
+        "income_or_expenditure": "Income" if is_income else "Expenditure",
+        "payment_mode": rng.choice(PAYMENT_MODES),
+        "amount": float(rng.randint(10, 3000 if category == "Rent" else 900)),
+    }
+    if with_id:
+        tx = {"id": f"{rng.getrandbits(64):016x}", **tx}
+    return tx
+
+
+def _debt(rng: random.Random, month_key: str, entry_id: int) -> dict:
+    return {
+        "id": str(entry_id),
+        "person": rng.choice(FRIENDS),
+        "amount": float(rng.randint(50, 2000)),
+        "description": rng.choice(["Dinner", "Movie tickets", "Cab", ""]),
+        "date": f"{month_key}-{rng.randint(1, 28):02d}",
+    }
+
+
+def generate_ledger(transactions: int, archived_months: int, current_month: str, seed: int = 0, with_ids: bool = True,
+                    debts: int = 0) -> dict:
+    """
+    A ledger in the legacy finance_data.json layout (archives nested in the document).
+
+    `transactions` are spread evenly over the archived months plus the current one;
+    `debts` to_take/to_give entries alternate between the two lists.
+    """
+    rng = random.Random(seed)
+    months = month_keys(current_month, archived_months + 1)
+    per_month = max(transactions // len(months), 0)
+    extra = transactions - per_month * len(months)
+
+    def month_transactions(index: int, key: str) -> list:
+        count = per_month + (1 if index < extra else 0)
+        return [_transaction(rng, key, with_ids) for _ in range(count)]
+
+    archives = {
+        key: {"monthly_allowance": 5000.0, "transactions": month_transactions(i, key)}
+        for i, key in enumerate(months[:-1])
+    }
+    return {
+        "current_month": current_month,
+        "monthly_allowance": 5000.0,
+        "categories": list(CATEGORIES),
+        "transactions": month_transactions(len(months) - 1, current_month),
+        "archives": archives,
+        "savings_goals": [
+            {"id": str(i), "name": f"Goal {i}", "target_amount": 1000.0 * (i + 1),
+             "target_date": f"{current_month}-28", "created_date": f"{current_month}-01"}
+            for i in range(3)
+        ],
+        "to_take": [_debt(rng, current_month, 3 + i) for i in range(0, debts, 2)],
+        "to_give": [_debt(rng, current_month, 3 + i) for i in range(1, debts, 2)],
+    }
+
+
+def write_ledger(data: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def write_csv(path: str, rows: int, seed: int = 0, start: date = date(2020, 1, 1)) -> None:
+    """A CSV export shaped like sample.csv, written row by row so any size fits in memory."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "category", "income_or_expenditure", "payment_mode", "amount"])
+        for _ in range(rows):
+            category = rng.choice(CATEGORIES)
+            writer.writerow([
+                (start + timedelta(days=rng.randint(0, 365 * 5))).isoformat(),
+                category,
+                "Income" if category in INCOME_CATEGORIES else "Expenditure",
+                rng.choice(["Cash", "Card", "UPI", "Bank Transfer"]),
+                rng.randint(10, 900),
+            ])
@@ -0,0 +1,117 @@
+"""
+Multi-user load test: rerun latency as the number of hosted users grows.
+
+    python -m benchmarks.tenants --users 1 10 100 500 --threads 8 --out tenants.json
+
+For each user count, that many per-user ledgers are generated under a scratch
+USERS_DIR and --threads concurrent "sessions" replay reruns for random users:
+use_ledger, load_data, rollover_month_if_needed and the typed frame, with a
+journal append every --write-every reruns. The median and p95 rerun latency
+should stay flat as users are added; pool evictions are reported alongside.
+Results use run.py's format, so benchmarks.compare works on them too.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+from benchmarks.run import _git_commit  # noqa: E402
+from benchmarks.synthetic import generate_ledger, write_ledger  # noqa: E402
+from finance_core import ledger_frame  # noqa: E402
+
+
+def _rerun(user_key: str, write: bool) -> float:
+    started = time.perf_counter()
+    storage.use_ledger(user_key)
+    data = storage.rollover_month_if_needed(storage.load_data())
+    ledger_frame(data["transactions"], ("current", user_key, data["current_month"], data["version"]))
+    if write:
+        storage.record_change(data, "append", "transactions", {
+            "id": storage.new_record_id(), "date": f"{data['current_month']}-01", "category": "Food",
+            "income_or_expenditure": "Expenditure", "payment_mode": "Cash", "amount": 1.0,
+        })
+    return time.perf_counter() - started
+
+
+def tenant_case(users_dir: str, users: int, transactions: int, threads: int, reruns: int, write_every: int) -> dict:
+    """Populate `users` ledgers, then time `reruns` reruns per thread for random users."""
+    keys = [f"user{i:05d}" for i in range(users)]
+    for i, key in enumerate(keys):
+        directory = storage.user_ledger_dir(key, users_dir)
+        os.makedirs(directory, exist_ok=True)
+        write_ledger(generate_ledger(transactions, 3, storage.get_current_month_key(), seed=i),
+                     os.path.join(directory, storage.DATA_FILE))
+
+    storage.USERS_DIR = users_dir
+    storage._POOL.clear()
+    storage._LOAD_CACHE.clear()
+    for counter in storage.POOL_STATS:
+        storage.POOL_STATS[counter] = 0
+    # Open every ledger once so migrations and id backfills are not timed
+    for key in keys:
+        _rerun(key, False)
+
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def session(seed: int) -> None:
+        rng = random.Random(seed)
+        mine = [_rerun(rng.choice(keys), (n + 1) % write_every == 0) for n in range(reruns)]
+        with latencies_lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=session, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    latencies.sort()
+    return {
+        "name": "tenants.rerun",
+        "params": {"users": users, "threads": threads, "transactions": transactions},
+        "seconds": statistics.median(latencies),
+        "p95_seconds": latencies[int(len(latencies) * 0.95) - 1],
+        "pool": storage.pool_stats(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rerun latency against the number of hosted users")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--transactions", type=int, default=300, help="transactions per user ledger")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--reruns", type=int, default=200, help="reruns per session")
+    parser.add_argument("--write-every", type=int, default=10)
+    parser.add_argument("--out", default="tenants_results.json")
+    args = parser.parse_args(argv)
+
+    meta = {"commit": _git_commit(), "python": platform.python_version(), "started": datetime.now().isoformat()}
+    results = []
+    for users in args.users:
+        with tempfile.TemporaryDirectory(prefix="finance-tenants-") as users_dir:
+            results.append(tenant_case(users_dir, users, args.transactions, args.threads, args.reruns, args.write_every))
+            storage.flush_all()  #Buffered changes must land before the directory goes
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    for result in results:
+        print(f"{result['params']['users']:6d} users  median {result['seconds'] * 1000:7.2f} ms  "
+              f"p95 {result['p95_seconds'] * 1000:7.2f} ms  pool {result['pool']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
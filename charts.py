@@ -0,0 +1,148 @@
+"""
+Chart rendering with an in-process cache.
+
+Streamlit re-runs a page on every widget interaction, and the charts on
+Insights, Savings and CSV Analysis usually get identical inputs from one run
+to the next. Each chart is described by a kind plus a JSON-serialisable spec
+(labels, values, colours, titles). The hash of that description keys a
+bounded LRU cache of rendered PNGs, so an unchanged chart is never redrawn.
+
+Figures are built with matplotlib.figure.Figure rather than pyplot, so they
+are never registered with pyplot's global figure manager and are released as
+soon as the PNG is written.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+
+import matplotlib
+from matplotlib.figure import Figure
+
+from profiling import stage
+
+
+CHART_CACHE_SIZE = 64  #Rendered PNGs kept per process
+CHART_DPI = 200  #Same resolution st.pyplot uses
+
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+CHART_STATS = {"hits": 0, "misses": 0}
+
+
+def _palette(spec: dict):
+    if "palette" in spec:
+        return matplotlib.colormaps[spec["palette"]].colors
+    return spec.get("colors")
+
+
+def _draw_pie(fig: Figure, spec: dict) -> None:
+    ax = fig.subplots()
+    ax.pie(
+        spec["values"],
+        labels=spec["labels"],
+        autopct="%1.1f%%",
+        startangle=90,
+        colors=_palette(spec),
+    )
+    ax.axis("equal")
+
+
+def _draw_line(fig: Figure, spec: dict) -> None:
+    ax = fig.subplots()
+    x = [datetime.fromisoformat(v) for v in spec["x"]] if spec.get("x_is_date") else spec["x"]
+    ax.plot(x, spec["y"], marker="o", color=spec.get("color", "#4c72b0"))
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.set_title(spec.get("title", ""))
+    ax.tick_params(axis="x", labelrotation=45)
+
+
+def _draw_bar(fig: Figure, spec: dict) -> None:
+    ax = fig.subplots()
+    ax.bar(spec["labels"], spec["values"], color=_palette(spec))
+    ax.set_ylabel(spec.get("ylabel", ""))
+
+
+def _draw_grouped_bar(fig: Figure, spec: dict) -> None:
+    #Side-by-side bars per label, one series per entry in spec["series"]
+    ax = fig.subplots()
+    x_pos = range(len(spec["labels"]))
+    width = 0.35
+    offsets = [-width / 2, width / 2]
+    for offset, series in zip(offsets, spec["series"]):
+        ax.bar([x + offset for x in x_pos], series["values"], width, label=series["label"], color=series["color"], alpha=0.7)
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.set_title(spec.get("title", ""))
+    ax.set_xticks(list(x_pos))
+    ax.set_xticklabels(spec["labels"], rotation=45, ha="right")
+    ax.legend()
+    fig.tight_layout()
+
+
+def _draw_lines(fig: Figure, spec: dict) -> None:
+    #Several series over the same labelled x axis; at most ~12 tick labels are shown
+    ax = fig.subplots()
+    positions = range(len(spec["x"]))
+    for series in spec["series"]:
+        ax.plot(positions, series["values"], marker="o", markersize=3, label=series["label"], color=series.get("color"))
+    step = max(1, -(-len(spec["x"]) // 12))
+    ax.set_xticks(list(positions)[::step])
+    ax.set_xticklabels(spec["x"][::step], rotation=45, ha="right")
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.set_title(spec.get("title", ""))
+    ax.legend()
+    fig.tight_layout()
+
+
+_DRAWERS = {
+    "pie": _draw_pie,
+    "line": _draw_line,
+    "bar": _draw_bar,
+    "grouped_bar": _draw_grouped_bar,
+    "lines": _draw_lines,
+}
+
+
+def chart_key(kind: str, spec: dict) -> str:
+    """Stable hash of a chart description."""
+    payload = json.dumps([kind, spec], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def render_chart(kind: str, spec: dict) -> tuple:
+    """
+    Return (png_bytes, elapsed_ms, from_cache) for a chart.
+
+    kind is one of "pie", "line", "bar", "grouped_bar" or "lines"; spec holds its inputs.
+    """
+    started = time.perf_counter()
+    key = chart_key(kind, spec)
+    with _CACHE_LOCK:
+        png = _CACHE.get(key)
+        if png is not None:
+            _CACHE.move_to_end(key)
+            CHART_STATS["hits"] += 1
+            return png, (time.perf_counter() - started) * 1000, True
+
+    with stage(f"matplotlib.{kind}"):
+        fig = Figure(figsize=spec.get("figsize"))
+        try:
+            _DRAWERS[kind](fig, spec)
+            buffer = BytesIO()
+            fig.savefig(buffer, format="png", dpi=CHART_DPI, bbox_inches="tight")
+            png = buffer.getvalue()
+        finally:
+            fig.clear()
+
+    with _CACHE_LOCK:
+        CHART_STATS["misses"] += 1
+        _CACHE[key] = png
+        while len(_CACHE) > CHART_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return png, (time.perf_counter() - started) * 1000, False
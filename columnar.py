@@ -0,0 +1,191 @@
+"""
+Memory-mapped column store of the archived months.
+
+Analytics over the archive (the forecast fit, Previous Months Data) used to
+parse every partition into records and copy them into pandas on each visit.
+Instead the archive is written once per change as fixed-width NumPy arrays,
+one .npy file per column, under <ledger>_columns/<archive signature>/:
+
+- day: int32 day numbers (finance_core.MISSING_DAY for unparseable dates)
+- amount: float64
+- category / income_or_expenditure / payment_mode: integer codes into the
+  vocabularies in manifest.json, stored in the dtype pandas uses for
+  categorical codes, so Categorical.from_codes wraps them without copying
+
+manifest.json also holds the months (sorted) and their row offsets: month i
+is rows offsets[i]:offsets[i + 1], so one month is a slice of every column.
+
+Arrays are opened with np.load(mmap_mode="r"): server processes share a
+single copy through the OS page cache, and a frame over a month or the whole
+archive is a set of views. The directory is named after
+storage.archive_signature, so a changed archive gets a new one. It is built
+in a temporary directory and renamed into place, after which older ones are
+removed; maps already open stay readable.
+
+Building reads every archived month, so pages never wait for it: once this
+module is imported every commit queues a background check (storage.on_commit),
+which rebuilds the store when a rollover or import changed the archive, and
+archive_columns(data, build=False) lets a page fall back to reading one month
+while the store is missing.
+
+The current month is not stored here: it changes on every click and its
+frame is already cached (finance_core.ledger_frame).
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from finance_core import FRAME_CACHE_SIZE, transactions_to_dataframe
+from profiling import profiled
+from storage import (
+    archive_columns_dir, archive_signature, current_ledger, list_archive_months, load_archive_month, on_commit, use_ledger,
+)
+
+CODE_COLUMNS = ("category", "income_or_expenditure", "payment_mode")
+STORED_COLUMNS = ("day", "amount", *CODE_COLUMNS)
+
+_OPEN = OrderedDict()  #(ledger, signature) -> ArchiveColumns, most recently used last
+_OPEN_LOCK = threading.Lock()
+_BUILDER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive-columns")
+_BUILD_QUEUED = {}  #Ledger -> newest ledger copy waiting for the builder
+
+
+class ArchiveColumns:
+    """Read-only columns of every archived transaction; see the module docstring."""
+
+    def __init__(self, months: list, offsets: np.ndarray, arrays: dict, vocabularies: dict):
+        self.months = months  #Archived month keys, oldest first
+        self.offsets = offsets  #(len(months) + 1,) first row of each month, then the row count
+        self.arrays = arrays  #Column -> array, memory-mapped when there are rows
+        self.vocabularies = vocabularies  #Code column -> labels its codes index
+        self._position = {month_key: i for i, month_key in enumerate(months)}
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def rows(self, month_key: str) -> slice:
+        """Rows of one archived month (empty for a month that is not archived)."""
+        i = self._position.get(month_key)
+        if i is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def frame(self, month_key: str = None) -> pd.DataFrame:
+        """
+        finance_core's typed frame, without the id column, for one month or (by
+        default) the whole archive. Every column is a view of the mapped arrays.
+        """
+        rows = slice(0, len(self)) if month_key is None else self.rows(month_key)
+        columns = {"day": self.arrays["day"][rows]}
+        for column in CODE_COLUMNS:
+            columns[column] = pd.Categorical.from_codes(self.arrays[column][rows], self.vocabularies[column], validate=False)
+        columns["amount"] = self.arrays["amount"][rows]
+        return pd.DataFrame(columns, copy=False)
+
+
+@profiled("archive_columns.build")
+def _build(root: str, signature: str, data: dict) -> None:
+    #Write the store for `signature` unless another process got there first, then drop older ones
+    months = sorted(list_archive_months(data))
+    transactions, offsets = [], [0]
+    for month_key in months:
+        transactions.extend(load_archive_month(data, month_key)["transactions"])
+        offsets.append(len(transactions))
+    frame = transactions_to_dataframe(transactions)
+    del transactions
+
+    os.makedirs(root, exist_ok=True)
+    building = tempfile.mkdtemp(prefix=".build-", dir=root)
+    try:
+        np.save(os.path.join(building, "day.npy"), frame["day"].to_numpy())
+        np.save(os.path.join(building, "amount.npy"), frame["amount"].to_numpy())
+        for column in CODE_COLUMNS:
+            np.save(os.path.join(building, f"{column}.npy"), frame[column].cat.codes.to_numpy())
+        manifest = {
+            "signature": signature,
+            "months": months,
+            "offsets": offsets,
+            "vocabularies": {column: [str(c) for c in frame[column].cat.categories] for column in CODE_COLUMNS},
+        }
+        with open(os.path.join(building, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.rename(building, os.path.join(root, signature))
+    except OSError:
+        # Already built by someone else (or the disk failed, and opening will say so)
+        shutil.rmtree(building, ignore_errors=True)
+
+    for name in os.listdir(root):
+        if name != signature and not name.startswith(".build-"):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _open(path: str) -> ArchiveColumns:
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    offsets = np.asarray(manifest["offsets"], dtype=np.int64)
+    # A zero-length file cannot be mapped
+    mmap_mode = "r" if offsets[-1] else None
+    arrays = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode=mmap_mode) for column in STORED_COLUMNS}
+    return ArchiveColumns(manifest["months"], offsets, arrays, manifest["vocabularies"])
+
+
+def archive_columns(data: dict, build: bool = True) -> ArchiveColumns:
+    """
+    Column store of the current ledger's archive, (re)built first if the archive
+    changed. With build=False a missing store is not built and None is returned.
+    """
+    signature = archive_signature(data)
+    key = (current_ledger(), signature)
+    with _OPEN_LOCK:
+        store = _OPEN.get(key)
+        if store is not None:
+            _OPEN.move_to_end(key)
+            return store
+
+    root = archive_columns_dir()
+    path = os.path.join(root, signature)
+    try:
+        store = _open(path)
+    except FileNotFoundError:
+        if not build:
+            return None
+        _build(root, signature, data)
+        store = _open(path)
+
+    with _OPEN_LOCK:
+        _OPEN[key] = store
+        while len(_OPEN) > FRAME_CACHE_SIZE:
+            _OPEN.popitem(last=False)
+    return store
+
+
+def build_in_background(ledger, data: dict) -> None:
+    """Queue a check (and, if the archive changed, a rebuild) of `ledger`'s store; registered with storage.on_commit."""
+    data = {**data, "archive_index": dict(data.get("archive_index", {}))}
+    with _OPEN_LOCK:
+        queued = ledger in _BUILD_QUEUED
+        _BUILD_QUEUED[ledger] = data
+    if not queued:
+        _BUILDER.submit(_build_queued, ledger)
+
+
+def _build_queued(ledger) -> None:
+    use_ledger(ledger)
+    with _OPEN_LOCK:
+        data = _BUILD_QUEUED.pop(ledger, None)
+    if data is None:
+        return
+    try:
+        archive_columns(data)
+    except OSError:
+        pass  # Pages keep reading single months until a later commit retries
+
+
+on_commit(build_in_background)
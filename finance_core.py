@@ -0,0 +1,500 @@
+"""
+UI-free ledger analytics shared by the Streamlit pages and the reports CLI.
+
+Transactions are turned into one compact, typed frame per month:
+
+- day: int32 days since 1970-01-01 (MISSING_DAY when the date is unparseable)
+- category, income_or_expenditure, payment_mode: categoricals, so a filter such
+  as df["income_or_expenditure"] == "Expenditure" compares int8 codes instead
+  of Python strings
+- amount: float64
+- id: the transaction's stable id
+
+Frames are built once per ledger version and shared by every page through
+ledger_frame(); callers must treat them as read-only.
+
+The metric functions (compute_basic_metrics, compute_insight_metrics,
+compute_savings, savings_timeline, goal_progress, month_summary,
+compute_trends, summarize_csv_stream, csv_transactions) take plain data and
+never touch Streamlit, so they run the same in a batch job.
+"""
+import calendar
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+
+MISSING_DAY = np.iinfo(np.int32).min  #Day number used for dates that could not be parsed
+FRAME_CACHE_SIZE = int(os.environ.get("FINANCE_FRAME_CACHE", "256"))  #Typed frames kept per process, one per hosted user's month
+
+FRAME_COLUMNS = ["id", "day", "category", "income_or_expenditure", "payment_mode", "amount"]
+
+_FRAME_CACHE = OrderedDict()
+_FRAME_CACHE_LOCK = threading.Lock()
+_ORDER_CACHE = OrderedDict()
+_ORDER_CACHE_LOCK = threading.Lock()
+_TIMELINE_CACHE = OrderedDict()
+_TIMELINE_CACHE_LOCK = threading.Lock()
+
+
+def dates_to_days(dates) -> np.ndarray:
+    """Parse date strings/datetimes into int32 day numbers."""
+    parsed = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy().astype("datetime64[D]")
+    days = parsed.view("int64")
+    return np.where(np.isnat(parsed), MISSING_DAY, days).astype("int32")
+
+
+def days_to_datetime(days) -> pd.Series:
+    """Day numbers back to datetime64, MISSING_DAY becoming NaT."""
+    days = pd.Series(days)
+    return pd.to_datetime(days.where(days != MISSING_DAY), unit="D")
+
+
+@profiled()
+def transactions_to_dataframe(transactions: list) -> pd.DataFrame:
+    #Convert list to a compact typed dataframe (see module docstring)
+    if not transactions:
+        return pd.DataFrame({
+            "id": pd.Series(dtype="object"),
+            "day": pd.Series(dtype="int32"),
+            "category": pd.Categorical([]),
+            "income_or_expenditure": pd.Categorical([]),
+            "payment_mode": pd.Categorical([]),
+            "amount": pd.Series(dtype="float64"),
+        })
+
+    raw = pd.DataFrame(transactions)
+    for column in FRAME_COLUMNS:
+        if column not in raw:
+            raw[column] = None
+    return pd.DataFrame({
+        "id": raw["id"].astype("object"),
+        "day": dates_to_days(raw["date"]),
+        "category": raw["category"].astype("category"),
+        "income_or_expenditure": raw["income_or_expenditure"].astype("category"),
+        "payment_mode": raw["payment_mode"].astype("category"),
+        "amount": pd.to_numeric(raw["amount"], errors="coerce").fillna(0.0).astype("float64"),
+    })
+
+
+def ledger_frame(transactions: list, cache_key=None) -> pd.DataFrame:
+    """
+    Typed frame for `transactions`, shared between pages and reruns.
+
+    cache_key must change whenever the transactions do (the ledger version is a
+    good choice); without one the frame is simply built.
+    """
+    if cache_key is None:
+        return transactions_to_dataframe(transactions)
+    with _FRAME_CACHE_LOCK:
+        df = _FRAME_CACHE.get(cache_key)
+        if df is not None:
+            _FRAME_CACHE.move_to_end(cache_key)
+            return df
+    df = transactions_to_dataframe(transactions)
+    with _FRAME_CACHE_LOCK:
+        _FRAME_CACHE[cache_key] = df
+        while len(_FRAME_CACHE) > FRAME_CACHE_SIZE:
+            _FRAME_CACHE.popitem(last=False)
+    return df
+
+
+def frame_for_display(df: pd.DataFrame) -> pd.DataFrame:
+    """The familiar date/category/type/mode/amount table for st.dataframe."""
+    return pd.DataFrame({
+        "date": days_to_datetime(df["day"]).dt.date.to_numpy(),
+        "category": df["category"].to_numpy(),
+        "income_or_expenditure": df["income_or_expenditure"].to_numpy(),
+        "payment_mode": df["payment_mode"].to_numpy(),
+        "amount": df["amount"].to_numpy(),
+    }, index=df.index)
+
+
+TABLE_PAGE_SIZE = 50  #Rows per page of the Dashboard transaction table
+TABLE_SORTS = {  #Label -> (sorted column, descending)
+    "Date (oldest first)": ("day", False),
+    "Date (newest first)": ("day", True),
+    "Amount Ascending": ("amount", False),
+    "Amount Descending": ("amount", True),
+}
+
+
+def frame_orders(df: pd.DataFrame, cache_key=None) -> dict:
+    """Row positions of `df` sorted by day and by amount; cached like ledger_frame, under the same key."""
+    if cache_key is not None:
+        with _ORDER_CACHE_LOCK:
+            orders = _ORDER_CACHE.get(cache_key)
+            if orders is not None:
+                _ORDER_CACHE.move_to_end(cache_key)
+                return orders
+    orders = {column: np.argsort(df[column].to_numpy(), kind="stable") for column in ("day", "amount")}
+    if cache_key is not None:
+        with _ORDER_CACHE_LOCK:
+            _ORDER_CACHE[cache_key] = orders
+            while len(_ORDER_CACHE) > FRAME_CACHE_SIZE:
+                _ORDER_CACHE.popitem(last=False)
+    return orders
+
+
+def transaction_page(df: pd.DataFrame, orders: dict, sort: str = "Date (oldest first)", kind: str = None,
+                     search: str = "", page: int = 1, page_size: int = TABLE_PAGE_SIZE) -> dict:
+    """
+    One page of the transaction table: rows of type `kind` (None for both) whose
+    category or payment mode contains `search`, in `sort` order (a TABLE_SORTS
+    label). Filtering works on the pre-sorted positions from frame_orders, so
+    only the page's own rows are taken out of the frame.
+
+    Returns {frame (typed rows of the page), total (matching rows), pages, page, start}.
+    """
+    column, descending = TABLE_SORTS[sort]
+    order = orders[column][::-1] if descending else orders[column]
+    mask = np.ones(len(df), dtype=bool)
+    if kind:
+        mask &= (df["income_or_expenditure"] == kind).to_numpy()
+    needle = search.strip().lower()
+    if needle:
+        # Match against the few distinct labels, then select rows by code
+        found = np.zeros(len(df), dtype=bool)
+        for name in ("category", "payment_mode"):
+            labels = [label for label in df[name].cat.categories if needle in str(label).lower()]
+            found |= df[name].isin(labels).to_numpy()
+        mask &= found
+    order = order[mask[order]]
+
+    pages = max(1, -(-len(order) // page_size))
+    page = min(max(int(page), 1), pages)
+    start = (page - 1) * page_size
+    return {
+        "frame": df.iloc[order[start:start + page_size]],
+        "total": len(order),
+        "pages": pages,
+        "page": page,
+        "start": start,
+    }
+
+
+@profiled()
+def compute_basic_metrics(df: pd.DataFrame, monthly_allowance: float) -> dict:
+#totals and derived metrics for dashboard
+    if df.empty:
+        transaction_income = 0.0
+        total_expense = 0.0
+    else:
+        transaction_income = df.loc[df["income_or_expenditure"] == "Income", "amount"].sum()
+        total_expense = df.loc[df["income_or_expenditure"] == "Expenditure", "amount"].sum()
+
+    # Monthly allowance is considered as income
+    total_income = monthly_allowance + transaction_income
+    
+    # Remaining budget = total income (allowance + transactions) - expenses
+    net_available = total_income - total_expense
+
+    return {
+        "total_income": float(total_income),  # Includes monthly allowance
+        "total_expense": float(total_expense),
+        "net_available": float(net_available),
+        "remaining_budget": float(max(net_available, 0.0)),  # Do not show negative as remaining
+    }
+
+
+@profiled()
+def compute_insight_metrics(metrics: dict, today: date = None) -> dict:
+    """
+   metrics for Insights page:
+    - average daily spending so far
+    - remaining days
+    - safe daily spending limit
+    """
+    today = today or date.today()
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    days_passed = today.day  # Up to and including today
+    remaining_days = max(days_in_month - days_passed, 0)
+
+    total_expense = metrics["total_expense"]
+    remaining_budget = metrics["remaining_budget"]
+
+    avg_daily_spent = total_expense / days_passed if days_passed > 0 else 0.0
+    safe_daily_spend = remaining_budget / remaining_days if remaining_days > 0 else 0.0
+
+    return {
+        "avg_daily_spent": float(avg_daily_spent),
+        "remaining_days": int(remaining_days),
+        "safe_daily_spend": float(safe_daily_spend),
+    }
+
+
+def compute_savings(df: pd.DataFrame, monthly_allowance: float) -> dict:
+    """Current savings (allowance + income - expenses) and the savings rate as % of allowance (None without one)."""
+    current_savings = compute_basic_metrics(df, monthly_allowance)["net_available"]
+    return {
+        "current_savings": current_savings,
+        "savings_rate": current_savings / monthly_allowance * 100 if monthly_allowance > 0 else None,
+    }
+
+
+class SavingsTimeline:
+    """Running total of the net saved per day from `start` on; see savings_timeline."""
+
+    def __init__(self, start: date, cumulative: np.ndarray):
+        self.start = start  #First day covered (None when there is no history at all)
+        self.cumulative = cumulative  #cumulative[i]: net saved from start through start + i days
+
+    def saved_through(self, day: date) -> float:
+        """Net saved from the start of the history up to and including `day`."""
+        if self.start is None or day < self.start:
+            return 0.0
+        return float(self.cumulative[min((day - self.start).days, len(self.cumulative) - 1)])
+
+    def saved_between(self, first: date, last: date) -> float:
+        """Net saved from `first` through `last`, both inclusive; two lookups whatever the span."""
+        if last < first:
+            return 0.0
+        return self.saved_through(last) - self.saved_through(first - timedelta(days=1))
+
+
+def _current_month_net(month_key: str, df: pd.DataFrame, monthly_allowance: float) -> np.ndarray:
+    #Same per-day net as storage.daily_net, from the typed frame
+    year, month = map(int, month_key.split("-"))
+    days = calendar.monthrange(year, month)[1]
+    first = (date(year, month, 1) - date(1970, 1, 1)).days
+    # Rows dated outside the month land on its first or last day, undated ones on the first
+    position = np.clip(df["day"].to_numpy().astype("int64") - first, 0, days - 1)
+    sign = np.where(df["income_or_expenditure"] == "Income", 1.0,
+                    np.where(df["income_or_expenditure"] == "Expenditure", -1.0, 0.0))
+    net = np.bincount(position, weights=df["amount"].to_numpy() * sign, minlength=days)
+    return net + float(monthly_allowance or 0.0) / days
+
+
+def savings_timeline(savings_prefix: dict, month_key: str, df: pd.DataFrame, monthly_allowance: float,
+                     cache_key=None) -> SavingsTimeline:
+    """
+    Join the persisted archive prefix (storage.build_savings_prefix) with the
+    current month's per-day net from its typed frame. cache_key should change
+    with the ledger version, like ledger_frame's.
+    """
+    if cache_key is not None:
+        with _TIMELINE_CACHE_LOCK:
+            timeline = _TIMELINE_CACHE.get(cache_key)
+            if timeline is not None:
+                _TIMELINE_CACHE.move_to_end(cache_key)
+                return timeline
+
+    archived = np.asarray((savings_prefix or {}).get("cumulative") or [], dtype="float64")
+    current = np.cumsum(_current_month_net(month_key, df, monthly_allowance))
+    year, month = map(int, month_key.split("-"))
+    if len(archived):
+        start = date.fromisoformat(savings_prefix["start"] + "-01")
+        # Months between the last archived one and this month saved nothing
+        gap = (date(year, month, 1) - start).days - len(archived)
+        if gap >= 0:
+            cumulative = np.concatenate([archived, np.full(gap, archived[-1]), archived[-1] + current])
+        else:
+            cumulative = archived
+    else:
+        start = date(year, month, 1)
+        cumulative = current
+    timeline = SavingsTimeline(start, cumulative)
+
+    if cache_key is not None:
+        with _TIMELINE_CACHE_LOCK:
+            _TIMELINE_CACHE[cache_key] = timeline
+            while len(_TIMELINE_CACHE) > FRAME_CACHE_SIZE:
+                _TIMELINE_CACHE.popitem(last=False)
+    return timeline
+
+
+def _parse_day(value):
+    try:
+        return datetime.fromisoformat(str(value)).date()
+    except (ValueError, TypeError):
+        return None
+
+
+def goal_progress(goal: dict, timeline: SavingsTimeline, today: date = None) -> dict:
+    """
+    Progress of one savings goal: the net saved from its created_date up to
+    today (or its target date, if that has passed), looked up in `timeline`.
+    """
+    today = today or date.today()
+    target_amount = goal.get("target_amount", 0.0)
+    target_date = _parse_day(goal.get("target_date"))
+    created_date = _parse_day(goal.get("created_date")) or today
+
+    saved = timeline.saved_between(created_date, min(today, target_date) if target_date else today)
+    progress_amount = max(saved, 0.0)  # Don't show negative progress
+    remaining = max(target_amount - progress_amount, 0.0)
+    days_remaining = (target_date - today).days if target_date else None
+    return {
+        "target_amount": target_amount,
+        "target_date": target_date,
+        "progress_amount": progress_amount,
+        "progress_percentage": min((progress_amount / target_amount * 100) if target_amount > 0 else 0.0, 100.0),
+        "remaining": remaining,
+        "days_remaining": days_remaining,
+        "suggested_daily": remaining / days_remaining if days_remaining and days_remaining > 0 else None,
+    }
+
+
+def month_summary(month_key: str, monthly_allowance: float, transactions: list) -> dict:
+    """Report row for one month: allowance, totals, transaction count and expenses per category."""
+    df = transactions_to_dataframe(transactions)
+    metrics = compute_basic_metrics(df, monthly_allowance)
+    expenses = df[df["income_or_expenditure"] == "Expenditure"]
+    by_category = expenses.groupby("category", observed=True)["amount"].sum().sort_values(ascending=False)
+    return {
+        "month": month_key,
+        "monthly_allowance": float(monthly_allowance),
+        **metrics,
+        "transaction_count": len(df),
+        "category_expense": {str(name): float(total) for name, total in by_category.items()},
+    }
+
+
+TREND_WINDOWS = (3, 6)  #Rolling windows (months) on the Trends page
+
+
+@profiled()
+def compute_trends(summaries: dict) -> dict:
+    """
+    Month-by-month trends from month summaries ({"YYYY-MM": summarize_month(...)}),
+    e.g. the archive index plus the current month.
+
+    Returns two frames indexed by month (a monthly PeriodIndex with no gaps;
+    months without a summary are NaN and skipped by the rolling means):
+
+    - totals: allowance, income, expense, net, savings_rate (% of allowance),
+      expense_delta and expense_change (% vs the previous month)
+    - categories: expense per category, plus "<category> avg3"/"avg6" style
+      rolling means for every window in TREND_WINDOWS
+    """
+    if not summaries:
+        empty = pd.DataFrame(index=pd.PeriodIndex([], freq="M"))
+        return {"totals": empty, "categories": empty}
+
+    months = pd.PeriodIndex(sorted(summaries), freq="M")
+    full_range = pd.period_range(months.min(), months.max(), freq="M")
+    ordered = [summaries[str(month)] for month in months]
+
+    totals = pd.DataFrame({
+        "allowance": [s.get("monthly_allowance", 0.0) for s in ordered],
+        "income": [s.get("total_income", 0.0) for s in ordered],
+        "expense": [s.get("total_expense", 0.0) for s in ordered],
+        "net": [s.get("net", 0.0) for s in ordered],
+    }, index=months, dtype="float64").reindex(full_range)
+    totals["savings_rate"] = (totals["net"] / totals["allowance"].where(totals["allowance"] > 0)) * 100
+    totals["expense_delta"] = totals["expense"].diff()
+    totals["expense_change"] = totals["expense"].pct_change(fill_method=None) * 100
+
+    # One row per month, one column per category; a month that has a summary but no
+    # spending in a category counts as 0 there
+    spending = pd.DataFrame.from_records(
+        [s.get("category_expense", {}) for s in ordered], index=months
+    ).astype("float64").fillna(0.0).reindex(full_range)
+    spending = spending[spending.sum().sort_values(ascending=False).index]
+    windows = [
+        spending.rolling(window, min_periods=1).mean().add_suffix(f" avg{window}")
+        for window in TREND_WINDOWS
+    ]
+    return {"totals": totals, "categories": pd.concat([spending, *windows], axis=1)}
+
+
+CSV_REQUIRED_COLUMNS = {"date", "category", "income_or_expenditure", "payment_mode", "amount"}
+CSV_CHUNK_ROWS = 100_000  #Rows parsed at a time by CSV Analysis
+CSV_PREVIEW_ROWS = 50  #Rows kept for the raw data preview
+
+
+@profiled()
+def summarize_csv_stream(source, chunk_rows: int = CSV_CHUNK_ROWS, preview_rows: int = CSV_PREVIEW_ROWS) -> dict:
+    """
+    Read a transactions CSV in chunks and accumulate everything CSV Analysis shows:
+    income/expense totals, date range, expense sums per category and per day, and a
+    preview of the first rows. Memory stays bounded by the chunk size plus the number
+    of distinct categories and days, however large the file is.
+    """
+    summary = {
+        "columns": [],
+        "missing_columns": False,
+        "preview": None,
+        "total_spending": 0.0,
+        "total_income": 0.0,
+        "min_date": None,
+        "max_date": None,
+        "expense_rows": 0,
+        "category_sums": pd.Series(dtype="float64"),
+        "daily_sums": pd.Series(dtype="float64"),
+    }
+    preview_parts = []
+    preview_count = 0
+
+    for chunk in pd.read_csv(source, chunksize=chunk_rows):
+        if not summary["columns"]:
+            summary["columns"] = list(chunk.columns)
+            if not CSV_REQUIRED_COLUMNS.issubset(chunk.columns):
+                summary["missing_columns"] = True
+                return summary
+
+        # Normalize dtypes
+        chunk["date"] = pd.to_datetime(chunk["date"], errors="coerce")
+        chunk["amount"] = pd.to_numeric(chunk["amount"], errors="coerce").fillna(0.0)
+
+        if preview_count < preview_rows:
+            preview_parts.append(chunk.head(preview_rows - preview_count))
+            preview_count += len(preview_parts[-1])
+
+        is_expense = chunk["income_or_expenditure"] == "Expenditure"
+        expenses = chunk.loc[is_expense]
+        summary["total_spending"] += float(expenses["amount"].sum())
+        summary["total_income"] += float(chunk.loc[chunk["income_or_expenditure"] == "Income", "amount"].sum())
+        summary["expense_rows"] += len(expenses)
+        summary["category_sums"] = summary["category_sums"].add(expenses.groupby("category")["amount"].sum(), fill_value=0.0)
+        summary["daily_sums"] = summary["daily_sums"].add(expenses.groupby("date")["amount"].sum(), fill_value=0.0)
+
+        dates = chunk["date"].dropna()
+        if not dates.empty:
+            low, high = dates.min(), dates.max()
+            summary["min_date"] = low if summary["min_date"] is None else min(summary["min_date"], low)
+            summary["max_date"] = high if summary["max_date"] is None else max(summary["max_date"], high)
+
+    summary["preview"] = pd.concat(preview_parts) if preview_parts else pd.DataFrame(columns=summary["columns"])
+    return summary
+
+
+TRANSACTION_TYPES = ("Income", "Expenditure")
+
+
+@profiled()
+def csv_transactions(source, chunk_rows: int = CSV_CHUNK_ROWS) -> dict:
+    """
+    Read a transactions CSV into ledger records for storage.import_transactions.
+    Rows without a parseable date or amount, or with a type other than Income or
+    Expenditure, are counted in invalid_rows and left out.
+    """
+    result = {"columns": [], "missing_columns": False, "transactions": [], "invalid_rows": 0}
+    for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False):
+        if not result["columns"]:
+            result["columns"] = list(chunk.columns)
+            if not CSV_REQUIRED_COLUMNS.issubset(chunk.columns):
+                result["missing_columns"] = True
+                return result
+
+        dates = pd.to_datetime(chunk["date"].str.strip(), errors="coerce")
+        amounts = pd.to_numeric(chunk["amount"].str.strip(), errors="coerce")
+        kinds = chunk["income_or_expenditure"].str.strip()
+        valid = dates.notna() & amounts.notna() & kinds.isin(TRANSACTION_TYPES)
+        result["invalid_rows"] += int((~valid).sum())
+        # Plain lists zipped into dicts; DataFrame.to_dict is several times slower here
+        columns = {
+            "date": dates[valid].dt.strftime("%Y-%m-%d").tolist(),
+            "category": chunk.loc[valid, "category"].str.strip().tolist(),
+            "income_or_expenditure": kinds[valid].tolist(),
+            "payment_mode": chunk.loc[valid, "payment_mode"].str.strip().tolist(),
+            "amount": amounts[valid].astype("float64").round(2).tolist(),
+        }
+        result["transactions"].extend(dict(zip(columns, values)) for values in zip(*columns.values()))
+    return result
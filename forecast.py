@@ -0,0 +1,236 @@
+"""
+Month-end spending forecasts for Insights.
+
+A ForecastModel is fitted from the archived months only, so it is reused
+until the archive changes (a rollover or an import). Adding a transaction
+just changes the month-to-date spend handed to predict(); reruns never refit.
+
+Per expense category the fit keeps:
+
+- level/sigma: exponential smoothing of the category's monthly totals (from
+  the month summary index), deseasonalised, with alpha picked per category
+  from ALPHAS by one-step-ahead error; sigma is that error's spread
+- season: calendar-month factors, shrunk towards 1, once there are
+  SEASON_MIN_MONTHS of history
+- timing: the average share of a month's spend already made by each day of
+  the month; rent-like categories reach ~1 on their payment day, so nothing
+  more is expected after it
+- weekday: relative spend per weekday, used to weigh the days still left
+"""
+import calendar
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from finance_core import MISSING_DAY
+from profiling import profiled
+
+
+ALPHAS = np.linspace(0.1, 0.9, 9)  #Smoothing factors tried per category
+SEASON_MIN_MONTHS = 24  #History needed before calendar-month seasonality is used
+SCHEDULED_SHARE = 0.5  #A category spending this share of a month on one day is treated as a fixed bill
+BAND_Z = 1.2816  #80% band
+FIT_CACHE_SIZE = 64  #Fitted models kept per process
+
+_FIT_CACHE = OrderedDict()
+_FIT_CACHE_LOCK = threading.Lock()
+
+
+class ForecastModel:
+    """Fitted per-category parameters; see the module docstring."""
+
+    def __init__(self, categories: list, level, sigma, season, timing, weekday, months: int):
+        self.categories = categories  #Column order of every array below
+        self.level = level  #(C,) deseasonalised monthly spend
+        self.sigma = sigma  #(C,) one-step error of the smoothed level
+        self.season = season  #(12, C) calendar-month factors
+        self.timing = timing  #(C, 31) cumulative share of the month's spend by day
+        self.weekday = weekday  #(C, 7) relative spend per weekday, mean 1
+        self.months = months  #Archived months the fit used
+
+    def predict(self, spent: dict, total_income: float, today: date = None) -> dict:
+        """
+        Project month-end spending from month-to-date spend per category.
+
+        Returns projected/lower/upper month-end expense, the expected remaining
+        spend of fixed bills, a safe daily spend that keeps those bills covered,
+        and one row per category.
+        """
+        today = today or date.today()
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        remaining_days = days_in_month - today.day
+        remaining_weekdays = [date(today.year, today.month, d).weekday() for d in range(today.day + 1, days_in_month + 1)]
+
+        categories = list(self.categories) + [c for c in spent if c not in self.categories]
+        known = len(self.categories)
+        spent_now = np.array([float(spent.get(c, 0.0)) for c in categories])
+
+        expected_total = np.zeros(len(categories))
+        sigma = np.zeros(len(categories))
+        share_done = np.ones(len(categories))
+        weekday_factor = np.zeros(len(categories))
+        if known:
+            season = self.season[today.month - 1]
+            expected_total[:known] = self.level * season
+            sigma[:known] = self.sigma * season
+            month_end = self.timing[:, days_in_month - 1]
+            share_done[:known] = np.divide(
+                self.timing[:, today.day - 1], month_end, out=np.full(known, today.day / days_in_month), where=month_end > 0
+            )
+            if remaining_weekdays:
+                weekday_factor[:known] = self.weekday[:, remaining_weekdays].mean(axis=1)
+
+        remaining_share = np.clip(1.0 - share_done, 0.0, 1.0)
+        expected_remaining = expected_total * remaining_share * weekday_factor
+        variance = sigma ** 2 * remaining_share
+        daily_share = np.diff(self.timing, axis=1, prepend=0.0).max(axis=1) if known else np.zeros(0)
+        scheduled = np.zeros(len(categories), dtype=bool)
+        scheduled[:known] = daily_share >= SCHEDULED_SHARE
+        # A fixed bill that has not shown up yet is still expected, whatever its usual day
+        expected_remaining = np.where(scheduled, np.maximum(expected_remaining, expected_total - spent_now), expected_remaining)
+        expected_remaining = np.maximum(expected_remaining, 0.0)
+
+        spent_total = float(spent_now.sum())
+        projected = spent_total + float(expected_remaining.sum())
+        spread = BAND_Z * float(np.sqrt(variance.sum()))
+        upcoming_bills = float(expected_remaining[scheduled].sum())
+        return {
+            "spent": spent_total,
+            "projected_expense": projected,
+            "lower": max(spent_total, projected - spread),
+            "upper": projected + spread,
+            "upcoming_bills": upcoming_bills,
+            "remaining_days": remaining_days,
+            "safe_daily_spend": max(total_income - spent_total - upcoming_bills, 0.0) / remaining_days if remaining_days > 0 else 0.0,
+            "categories": [
+                {
+                    "category": category,
+                    "spent": float(spent_now[i]),
+                    "expected_remaining": float(expected_remaining[i]),
+                    "projected": float(spent_now[i] + expected_remaining[i]),
+                    "scheduled": bool(scheduled[i]),
+                }
+                for i, category in enumerate(categories)
+            ],
+        }
+
+
+def _smooth(history: np.ndarray) -> tuple:
+    #Exponential smoothing of every column for every alpha at once; returns (level, sigma) per column
+    levels = np.repeat(history[:1], len(ALPHAS), axis=0)  # (K, C)
+    sse = np.zeros_like(levels)
+    alphas = ALPHAS[:, None]
+    for row in history[1:]:
+        error = row - levels
+        sse += error ** 2
+        levels = levels + alphas * error
+    best = sse.argmin(axis=0)
+    columns = np.arange(history.shape[1])
+    if len(history) > 1:
+        sigma = np.sqrt(sse[best, columns] / (len(history) - 1))
+    else:
+        sigma = history[0] * 0.25  # one month of history: assume a wide band
+    return levels[best, columns], sigma
+
+
+def _seasonality(history: np.ndarray, calendar_months: np.ndarray) -> np.ndarray:
+    season = np.ones((12, history.shape[1]))
+    if len(history) < SEASON_MIN_MONTHS:
+        return season
+    overall = history.mean(axis=0)
+    for month in range(12):
+        rows = history[calendar_months == month + 1]
+        if len(rows):
+            ratio = np.divide(rows.mean(axis=0), overall, out=np.ones_like(overall), where=overall > 0)
+            season[month] = 1 + (ratio - 1) * len(rows) / (len(rows) + 2)
+    return season
+
+
+def _profiles(frame: pd.DataFrame, categories: list, month_keys: list) -> tuple:
+    #Day-of-month timing and weekday weights per category from archived expenses
+    timing = np.tile(np.arange(1, 32) / 31.0, (len(categories), 1))
+    weekday = np.ones((len(categories), 7))
+    expenses = frame[(frame["income_or_expenditure"] == "Expenditure") & (frame["day"] != MISSING_DAY)]
+    if expenses.empty:
+        return timing, weekday
+
+    dates = pd.to_datetime(expenses["day"].to_numpy(), unit="D")
+    daily = pd.DataFrame({
+        "category": expenses["category"].astype(str).to_numpy(),
+        "month": dates.to_period("M").astype(str),
+        "dom": dates.day,
+        "weekday": dates.weekday,
+        "amount": expenses["amount"].to_numpy(),
+    })
+    by_day = daily.pivot_table(index=["category", "month"], columns="dom", values="amount", aggfunc="sum", fill_value=0.0)
+    by_day = by_day.reindex(columns=range(1, 32), fill_value=0.0)
+    cumulative = by_day.cumsum(axis=1)
+    totals = cumulative[31]
+    shares = cumulative[totals > 0].div(totals[totals > 0], axis=0).groupby(level="category").mean()
+
+    # Weekday weight: spend per occurrence of that weekday in the archived months, normalised to mean 1
+    occurrences = np.zeros(7)
+    for key in month_keys:
+        year, month = map(int, key.split("-"))
+        for week in calendar.monthcalendar(year, month):
+            occurrences += np.array(week) > 0
+    per_weekday = daily.pivot_table(index="category", columns="weekday", values="amount", aggfunc="sum", fill_value=0.0)
+    per_weekday = per_weekday.reindex(columns=range(7), fill_value=0.0) / np.maximum(occurrences, 1)
+
+    for i, category in enumerate(categories):
+        if category in shares.index:
+            timing[i] = shares.loc[category].to_numpy()
+        if category in per_weekday.index:
+            row = per_weekday.loc[category].to_numpy()
+            if row.mean() > 0:
+                weekday[i] = row / row.mean()
+    return timing, weekday
+
+
+@profiled("forecast.fit")
+def fit_forecast(summaries: dict, frame: pd.DataFrame) -> ForecastModel:
+    """
+    Fit a model from archived month summaries ({"YYYY-MM": summarize_month(...)})
+    and a typed frame of the archived transactions (finance_core layout).
+    """
+    month_keys = sorted(summaries)
+    categories = sorted({c for key in month_keys for c in summaries[key].get("category_expense", {})})
+    if not month_keys or not categories:
+        return ForecastModel([], np.zeros(0), np.zeros(0), np.ones((12, 0)), np.zeros((0, 31)), np.ones((0, 7)), len(month_keys))
+
+    history = np.array([[summaries[key].get("category_expense", {}).get(c, 0.0) for c in categories] for key in month_keys])
+    calendar_months = np.array([int(key.split("-")[1]) for key in month_keys])
+    season = _seasonality(history, calendar_months)
+    level, sigma = _smooth(history / season[calendar_months - 1])
+    timing, weekday = _profiles(frame, categories, month_keys)
+    return ForecastModel(categories, level, sigma, season, timing, weekday, len(month_keys))
+
+
+def summaries_digest(summaries: dict) -> str:
+    """Stable hash of the archive summaries; changes only when the archive does."""
+    return hashlib.sha1(json.dumps(summaries, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def forecast_model(summaries: dict, load_frame, cache_key=None) -> ForecastModel:
+    """
+    Cached fit_forecast. load_frame() builds the archived-transactions frame and is
+    only called on a cache miss; cache_key should include summaries_digest(summaries).
+    """
+    if cache_key is not None:
+        with _FIT_CACHE_LOCK:
+            model = _FIT_CACHE.get(cache_key)
+            if model is not None:
+                _FIT_CACHE.move_to_end(cache_key)
+                return model
+    model = fit_forecast(summaries, load_frame())
+    if cache_key is not None:
+        with _FIT_CACHE_LOCK:
+            _FIT_CACHE[cache_key] = model
+            while len(_FIT_CACHE) > FIT_CACHE_SIZE:
+                _FIT_CACHE.popitem(last=False)
+    return model
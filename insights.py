@@ -0,0 +1,193 @@
+"""
+Insights figures computed off the page, one snapshot per ledger.
+
+Every committed change (storage.on_commit) queues the ledger for a single
+background thread, which rebuilds the month's metrics, the month-end forecast
+and the chart PNGs and then publishes them as an InsightSnapshot. The Insights
+page only reads the latest snapshot, so its cost does not grow with the
+ledger; it shows the snapshot's age and, while a newer version is being
+computed, says so.
+
+A burst of changes to one ledger queues one rebuild: while a rebuild is
+waiting, newer changes just replace the ledger it will read. Snapshots are
+never modified after publishing, so pages and the worker share them freely.
+Nothing is built on the request path, as the forecast fit reads the whole
+archive: when there is no snapshot for the ledger yet (first visit in this
+process) or it belongs to an earlier day or month, the page queues a rebuild
+and shows a placeholder until it is published.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from types import MappingProxyType
+
+from charts import render_chart
+from columnar import archive_columns
+from finance_core import MISSING_DAY, compute_basic_metrics, compute_insight_metrics, days_to_datetime, ledger_frame
+from forecast import forecast_model, summaries_digest
+from profiling import stage
+from storage import BACKEND_POOL_SIZE, archive_summaries, load_data, on_commit, use_ledger
+
+SNAPSHOT_CACHE_SIZE = BACKEND_POOL_SIZE  #Snapshots kept per process, one per recently active ledger
+
+_SNAPSHOTS = OrderedDict()
+_QUEUED = {}  #Ledger -> newest committed data not yet picked up by the worker
+_SCHEDULED = {}  #Ledger -> newest (version, day) handed to the worker
+_LOCK = threading.Lock()
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="insights")
+INSIGHT_STATS = {"published": 0, "coalesced": 0, "failed": 0}
+
+
+class InsightSnapshot:
+    """Everything the Insights page shows for one ledger version; read-only once published."""
+
+    def __init__(self, ledger, month: str, version: int, day: date, basic, insight, prediction, charts):
+        self.ledger = ledger
+        self.month = month
+        self.version = version  #Ledger version the figures were computed from
+        self.day = day  #Day the insight metrics (days left, safe spend) refer to
+        self.basic = MappingProxyType(basic)  #compute_basic_metrics output
+        self.insight = MappingProxyType(insight)  #compute_insight_metrics output
+        self.prediction = None if prediction is None else MappingProxyType({**prediction, "categories": tuple(prediction["categories"])})
+        self.charts = MappingProxyType(charts)  #"category" / "daily" / "income_vs_expense" -> render_chart() result
+        self.computed_at = time.time()
+
+    def age_seconds(self) -> float:
+        return time.time() - self.computed_at
+
+
+def archived_frame(data: dict):
+    #Typed frame of every archived month, read from the mapped column store; only needed when a forecast is (re)fitted
+    return archive_columns(data).frame()
+
+
+def forecast_month_end(ledger, data: dict, df, total_income: float):
+    """Forecast-based month-end projection, or None before the first archived month."""
+    summaries = archive_summaries(data)
+    if not summaries:
+        return None
+    model = forecast_model(summaries, lambda: archived_frame(data), ("forecast", ledger, summaries_digest(summaries)))
+    expenses = df[df["income_or_expenditure"] == "Expenditure"]
+    spent = expenses.groupby("category", observed=True)["amount"].sum()
+    with stage("forecast.predict"):
+        return model.predict({str(c): float(v) for c, v in spent.items()}, total_income)
+
+
+def _chart_specs(df, basic: dict) -> dict:
+    #Chart descriptions for charts.render_chart; none at all for an empty month
+    if df.empty:
+        return {}
+    specs = {}
+    df_exp = df[df["income_or_expenditure"] == "Expenditure"]
+    if not df_exp.empty:
+        with stage("pandas.groupby.category"):
+            category_sums = df_exp.groupby("category", observed=True)["amount"].sum().sort_values(ascending=False)
+        # Use calm, non-red colors
+        specs["category"] = ("pie", {
+            "labels": [str(c) for c in category_sums.index],
+            "values": [float(v) for v in category_sums.values],
+            "palette": "Pastel2",
+        })
+        with stage("pandas.groupby.day"):
+            daily = df_exp.groupby("day")["amount"].sum().reset_index()
+            daily = daily[daily["day"] != MISSING_DAY].sort_values("day")
+        specs["daily"] = ("line", {
+            "x": [d.isoformat() for d in days_to_datetime(daily["day"])],
+            "x_is_date": True,
+            "y": [float(v) for v in daily["amount"]],
+            "color": "#4c72b0",
+            "xlabel": "Date",
+            "ylabel": "Amount",
+            "title": "Daily Expenditure",
+        })
+    specs["income_vs_expense"] = ("bar", {
+        "labels": ["Income", "Expenditure"],
+        "values": [basic["total_income"], basic["total_expense"]],
+        "colors": ["#55a868", "#4c72b0"],  # Calm green and blue
+        "ylabel": "Amount",
+    })
+    return specs
+
+
+def build_snapshot(ledger, data: dict, today: date = None) -> InsightSnapshot:
+    """Compute every Insights figure for `data` (the ledger of `ledger`)."""
+    today = today or date.today()
+    # Same cache key as app.current_month_key, so the pages and the worker share one frame
+    df = ledger_frame(data.get("transactions", []), ("current", ledger, data.get("current_month"), data.get("version", 0)))
+    basic = compute_basic_metrics(df, data.get("monthly_allowance", 0.0))
+    insight = compute_insight_metrics(basic, today)
+    prediction = forecast_month_end(ledger, data, df, basic["total_income"])
+    charts = {name: render_chart(kind, spec) for name, (kind, spec) in _chart_specs(df, basic).items()}
+    return InsightSnapshot(ledger, data.get("current_month"), data.get("version", 0), today, basic, insight, prediction, charts)
+
+
+def publish(snapshot: InsightSnapshot) -> None:
+    """Make `snapshot` its ledger's latest, unless a newer one is already there."""
+    with _LOCK:
+        current = _SNAPSHOTS.get(snapshot.ledger)
+        if current is not None and (current.version, current.day) > (snapshot.version, snapshot.day):
+            return
+        _SNAPSHOTS[snapshot.ledger] = snapshot
+        _SNAPSHOTS.move_to_end(snapshot.ledger)
+        INSIGHT_STATS["published"] += 1
+        while len(_SNAPSHOTS) > SNAPSHOT_CACHE_SIZE:
+            evicted, _ = _SNAPSHOTS.popitem(last=False)
+            _SCHEDULED.pop(evicted, None)
+
+
+def latest_snapshot(ledger):
+    """The newest published snapshot of `ledger`, or None."""
+    with _LOCK:
+        return _SNAPSHOTS.get(ledger)
+
+
+def schedule(ledger, data: dict) -> None:
+    """Queue a rebuild of `ledger`'s snapshot from `data` (registered with storage.on_commit)."""
+    with _LOCK:
+        queued = ledger in _QUEUED
+        _QUEUED[ledger] = data
+        _SCHEDULED[ledger] = max(_SCHEDULED.get(ledger, (0, date.min)), (data.get("version", 0), date.today()))
+        if queued:
+            INSIGHT_STATS["coalesced"] += 1
+            return
+    _EXECUTOR.submit(_refresh, ledger)
+
+
+def _refresh(ledger) -> None:
+    # The worker thread has its own context: only the ledger is set, so nothing (such as the committing
+    # rerun's profiling stages) leaks in from the session that queued the rebuild
+    use_ledger(ledger)
+    with _LOCK:
+        data = _QUEUED.pop(ledger, None)
+    if data is None:
+        return
+    try:
+        publish(build_snapshot(ledger, data))
+    except Exception:
+        # The page keeps showing the previous snapshot (or its placeholder) and queues another rebuild
+        with _LOCK:
+            INSIGHT_STATS["failed"] += 1
+            _SCHEDULED.pop(ledger, None)
+
+
+def insight_snapshot(ledger, data: dict):
+    """
+    The snapshot for the Insights page, or None while the first one for this month
+    and day is being computed. A stale version is served as it is while a rebuild
+    is queued; either way the rebuild is queued here if nothing newer is.
+    """
+    today = date.today()
+    snapshot = latest_snapshot(ledger)
+    if snapshot is not None and (snapshot.day != today or snapshot.month != data.get("current_month")):
+        snapshot = None
+    with _LOCK:
+        newest = max(_SCHEDULED.get(ledger, (0, date.min)), (snapshot.version, snapshot.day) if snapshot else (0, date.min))
+    if newest < (data.get("version", 0), today):
+        # Missing, from an earlier day or changed by another process: the worker gets its own copy of the ledger
+        schedule(ledger, load_data())
+    return snapshot
+
+
+on_commit(schedule)
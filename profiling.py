@@ -0,0 +1,105 @@
+"""
+Opt-in per-rerun profiling.
+
+Code marks the work it wants measured with stage(), as a context manager or
+through the profiled() decorator:
+
+    with stage("load_data"):
+        data = load_data()
+
+Outside of a profiled rerun both are a single context-variable lookup, so they
+can stay in place permanently. Between begin_rerun() and end_rerun() every
+stage records its wall time, call count and the net memory it allocated
+(via tracemalloc, which is only running while profiling is switched on).
+Nested stages are reported under their own names; a parent's time includes
+its children.
+"""
+import contextvars
+import functools
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+
+PROFILE_HISTORY = 20  #Reruns kept per page
+
+_ACTIVE = contextvars.ContextVar("finance_profile", default=None)
+# tracemalloc is process-wide, so it may only stop once no session is in the middle of a profiled rerun
+_PROFILED_RERUNS = 0
+_TRACING_LOCK = threading.Lock()
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block under `name` if a rerun is being profiled."""
+    stages = _ACTIVE.get()
+    if stages is None:
+        yield
+        return
+    memory_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        memory_after = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        entry = stages.setdefault(name, {"calls": 0, "ms": 0.0, "alloc_kb": 0.0})
+        entry["calls"] += 1
+        entry["ms"] += elapsed_ms
+        entry["alloc_kb"] += (memory_after - memory_before) / 1024
+
+
+def profiled(name: str = None):
+    """Decorator form of stage(); defaults to the function's name."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin_rerun():
+    """Start collecting stages for this rerun; returns a token for end_rerun()."""
+    global _PROFILED_RERUNS
+    with _TRACING_LOCK:
+        _PROFILED_RERUNS += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    return _ACTIVE.set({}), time.perf_counter()
+
+
+def end_rerun(token) -> dict:
+    """Stop collecting and return {"started", "total_ms", "stages"} for the rerun."""
+    global _PROFILED_RERUNS
+    context_token, started = token
+    with _TRACING_LOCK:
+        _PROFILED_RERUNS -= 1
+    stages = _ACTIVE.get() or {}
+    _ACTIVE.reset(context_token)
+    return {
+        "started": time.time(),
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "stages": stages,
+    }
+
+
+def stop_tracing() -> None:
+    """Turn allocation tracking off again once profiling is disabled and no profiled rerun is running."""
+    with _TRACING_LOCK:
+        if _PROFILED_RERUNS == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def remember(history: dict, page: str, run: dict, limit: int = PROFILE_HISTORY) -> list:
+    """Append `run` to the rolling per-page history and return that page's runs."""
+    runs = history.get(page)
+    if runs is None or runs.maxlen != limit:
+        runs = history[page] = deque(runs or [], maxlen=limit)
+    runs.append(run)
+    return list(runs)
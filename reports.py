@@ -0,0 +1,105 @@
+"""
+Batch monthly reports over many ledgers, without Streamlit.
+
+    python reports.py users/ --format csv --out reports.csv --workers 8
+
+Every ledger under the given directory (finance_data.json snapshots and
+finance_data.db databases, e.g. a FINANCE_USERS_DIR tree) is summarised month
+by month with finance_core.month_summary, one ledger per task in a process
+pool. The output is one JSON document, or one CSV row per ledger-month.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from finance_core import month_summary
+from storage import DATA_FILE, SQLITE_FILE, read_ledger_months
+
+
+# File name found on disk -> ledger path to open; a new JSON ledger may only have its journal so far
+LEDGER_FILES = {
+    os.path.basename(DATA_FILE): os.path.basename(DATA_FILE),
+    os.path.basename(DATA_FILE) + ".journal": os.path.basename(DATA_FILE),
+    os.path.basename(SQLITE_FILE): os.path.basename(SQLITE_FILE),
+}
+CSV_FIELDS = [
+    "ledger", "month", "monthly_allowance", "total_income", "total_expense",
+    "net_available", "remaining_budget", "transaction_count", "category_expense",
+]
+
+
+def find_ledgers(root: str) -> list:
+    """Paths of every ledger file below `root`, sorted."""
+    found = set()
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = [d for d in subdirs if not d.endswith("_archives")]
+        found.update(os.path.join(directory, LEDGER_FILES[name]) for name in files if name in LEDGER_FILES)
+    return sorted(found)
+
+
+def ledger_report(path: str) -> dict:
+    """Monthly summaries of one ledger; a ledger that cannot be read reports its error instead."""
+    try:
+        months = [month_summary(key, allowance, transactions) for key, allowance, transactions in read_ledger_months(path)]
+    except (OSError, ValueError, KeyError, sqlite3.Error) as exc:
+        return {"ledger": path, "error": f"{type(exc).__name__}: {exc}"}
+    return {"ledger": path, "months": months}
+
+
+def write_json(reports, out) -> int:
+    #Streamed so thousands of ledgers never sit in memory at once
+    errors = 0
+    out.write('{"generated": %s, "ledgers": [\n' % json.dumps(datetime.now().isoformat()))
+    for n, report in enumerate(reports):
+        errors += "error" in report
+        out.write((",\n" if n else "") + json.dumps(report, ensure_ascii=False))
+    out.write("\n]}\n")
+    return errors
+
+
+def write_csv(reports, out) -> int:
+    errors = 0
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for report in reports:
+        if "error" in report:
+            errors += 1
+            print(f"{report['ledger']}: {report['error']}", file=sys.stderr)
+            continue
+        for month in report["months"]:
+            writer.writerow({
+                **month,
+                "ledger": report["ledger"],
+                "category_expense": json.dumps(month["category_expense"], ensure_ascii=False),
+            })
+    return errors
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Monthly summary reports for a directory of ledgers")
+    parser.add_argument("root", help="directory searched recursively for ledgers")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--out", default="-", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args(argv)
+
+    ledgers = find_ledgers(args.root)
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8", newline="")
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            reports = pool.map(ledger_report, ledgers, chunksize=max(1, len(ledgers) // (args.workers * 4 or 1)))
+            errors = (write_json if args.format == "json" else write_csv)(reports, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Summarised {len(ledgers) - errors} of {len(ledgers)} ledgers", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
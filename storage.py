@@ -0,0 +1,1570 @@
+"""
+Persistence for the allowance tracker.
+
+Two interchangeable backends sit behind load_data / save_data / record_change:
+
+- JsonBackend (default): a JSON snapshot (DATA_FILE) plus an append-only
+  journal of changes that is folded back into the snapshot once it grows, so
+  a single click costs a few hundred bytes on disk no matter how much history
+  the snapshot holds. Writes happen under an advisory file lock, snapshots are
+  replaced atomically, and each change carries a version number so a session
+  holding a stale copy replays newer changes before adding its own. Archived
+  months live in one columnar file each under finance_data_archives/; the
+  snapshot only keeps their summaries (totals, per-category sums and counts,
+  see summarize_month) in "archive_index".
+- SqliteBackend: one table per collection with indexes on (month, date) and
+  (month, category). Only the current month is loaded; archived months are
+  fetched one at a time through load_archive_month, and their summaries are
+  stored in month_summaries.
+
+Both backends also keep "savings_prefix": a running total of the net saved on
+every archived day (build_savings_prefix), so the saved amount between any two
+archived dates is one subtraction. It is rebuilt whenever archive_index changes.
+
+Streamlit re-runs the page script on every interaction, so JsonBackend keeps
+the parsed ledger in a process-wide cache keyed on the snapshot and journal
+(mtime, size); an unchanged ledger is never parsed twice. See cache_stats().
+
+JsonBackend also buffers bursts of changes: record_change applies a change in
+memory straight away and the backend appends everything buffered to the
+journal in one fsync'd write once FINANCE_WRITE_BEHIND_MS has passed,
+FINANCE_WRITE_BEHIND_MAX changes are waiting, or before any other write,
+rollover or exit (flush_all). A crash can lose at most that window; set
+FINANCE_WRITE_BEHIND_MS=0 to write every change through. See write_stats().
+Changes to goals and debt entries are always written through, because their
+counter ids must be drawn under the write lock.
+
+Select the backend with the FINANCE_STORAGE environment variable ("json" or
+"sqlite"). `python storage.py import-sqlite` copies a JSON ledger into SQLite.
+
+Multi-user hosting: set FINANCE_USERS_DIR and call use_ledger(user_key) at the
+start of every rerun. Each user then gets their own ledger directory,
+USERS_DIR/<2-hex shard>/<user_key>/, with its own snapshot, journal, lock file
+and archives, so users never wait on each other's locks. Backends for the most
+recently used BACKEND_POOL_SIZE users are kept open; evicting one also drops
+its parsed ledger from the load cache, which keeps memory bounded.
+"""
+import argparse
+import atexit
+import calendar
+import contextvars
+import hashlib
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import date, datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+DATA_FILE = "finance_data.json"  #Main data file (snapshot)
+SQLITE_FILE = "finance_data.db"  #Database used by the sqlite backend
+STORAGE_BACKEND = os.environ.get("FINANCE_STORAGE", "json")  #"json" or "sqlite"
+JOURNAL_COMPACT_BYTES = 256 * 1024  #Fold the journal into the snapshot once it grows past this
+USERS_DIR = os.environ.get("FINANCE_USERS_DIR")  #Root of the per-user ledgers; unset means one shared ledger
+BACKEND_POOL_SIZE = int(os.environ.get("FINANCE_BACKEND_POOL", "256"))  #Per-user backends kept open
+WRITE_BEHIND_SECONDS = float(os.environ.get("FINANCE_WRITE_BEHIND_MS", "1000")) / 1000  #How long JSON changes may wait in memory; 0 writes each one through
+WRITE_BEHIND_MAX = int(os.environ.get("FINANCE_WRITE_BEHIND_MAX", "64"))  #Buffered changes that force a flush
+BUFFER_KEY = "unflushed"  #Marks an in-memory ledger whose newest versions are still buffered (never written to disk)
+
+DEFAULT_CATEGORIES = [
+    "Food",
+    "Transport",
+    "Rent / Hostel",
+    "Groceries",
+    "Entertainment",
+    "Academic",
+    "Health",
+    "Savings",
+    "Miscellaneous",
+]
+
+
+def get_current_month_key() -> str:
+    """Return the current month in 'YYYY-MM' format, used as a key in JSON."""
+    today = date.today()
+    return f"{today.year:04d}-{today.month:02d}"
+
+
+def _default_data(categories: list) -> dict:
+    return {
+        "current_month": get_current_month_key(),
+        "monthly_allowance": 0.0,
+        "categories": categories,
+        "transactions": [],  # List of dicts
+        "archive_index": {},  # "YYYY-MM": summarize_month(...) of each archived month
+        "savings_prefix": build_savings_prefix({}),  # Cumulative net savings per archived day
+        "savings_goals": [],  # List of savings goal dicts: {id, name, target_amount, target_date, created_date}
+        "to_take": [],  # Money friends owe you: {id, person, amount, description, date}
+        "to_give": [],  # Money you owe friends: {id, person, amount, description, date}
+        "balances": {},  # Per-person totals of to_take/to_give, see build_balances
+        "next_id": 1,  # Next id handed out to a savings goal or to_take/to_give entry
+        "version": 0,  # Bumped by every persisted change, used to detect stale copies
+    }
+
+
+def _ensure_keys(data: dict) -> dict:
+    # Ensure required keys exist even if file is old
+    data.setdefault("current_month", get_current_month_key())
+    data.setdefault("monthly_allowance", 0.0)
+    data.setdefault("categories", [])
+    data.setdefault("transactions", [])
+    data.setdefault("archive_index", {})
+    data.setdefault("savings_goals", [])
+    data.setdefault("to_take", [])
+    data.setdefault("to_give", [])
+    if "balances" not in data:
+        data["balances"] = build_balances(data["to_take"], data["to_give"])
+    data.setdefault("next_id", _next_free_id(data))
+    data.setdefault("version", 0)
+    return data
+
+
+DEBT_KEYS = ("to_take", "to_give")
+
+
+def person_key(name) -> str:
+    """Key of a person in the balances index; names differing only in case or spacing are the same friend."""
+    return " ".join(str(name or "").split()).casefold() or "unknown"
+
+
+def _adjust_balances(balances: dict, key: str, removed: list, added: list) -> None:
+    #Move the totals of the affected people only; entries are replaced, never mutated, as they may be shared
+    for sign, entries in ((-1, removed), (1, added)):
+        for entry in entries:
+            person = person_key(entry.get("person"))
+            current = balances.get(person) or {"person": " ".join(str(entry.get("person") or "Unknown").split()),
+                                               "to_take": 0.0, "to_give": 0.0, "entries": 0}
+            updated = {
+                **current,
+                key: round(current[key] + sign * float(entry.get("amount") or 0.0), 2),
+                "entries": current["entries"] + sign,
+            }
+            if updated["entries"] > 0:
+                balances[person] = updated
+            else:
+                balances.pop(person, None)
+
+
+def build_balances(to_take: list, to_give: list) -> dict:
+    """
+    Per-person index of the To Take & To Give records: {person_key: {person,
+    to_take, to_give, entries}}. Kept up to date by apply_change on every
+    add, edit and delete, so the page never has to re-add every entry.
+    """
+    balances = {}
+    _adjust_balances(balances, "to_take", [], to_take)
+    _adjust_balances(balances, "to_give", [], to_give)
+    return balances
+
+
+def summarize_month(monthly_allowance: float, transactions: list, month_key: str = None) -> dict:
+    """
+    Summary kept per archived month in archive_index, so month pickers, cross-month
+    totals and trends never have to open a partition. total_income includes the
+    allowance; category_income/category_expense hold the per-category totals.
+    With month_key, daily_net holds the net saved on each day of the month.
+    """
+    income = 0.0
+    expense = 0.0
+    category_income = {}
+    category_expense = {}
+    for tx in transactions:
+        amount = float(tx.get("amount") or 0.0)
+        category = tx.get("category") or "Other"
+        if tx.get("income_or_expenditure") == "Income":
+            income += amount
+            category_income[category] = category_income.get(category, 0.0) + amount
+        elif tx.get("income_or_expenditure") == "Expenditure":
+            expense += amount
+            category_expense[category] = category_expense.get(category, 0.0) + amount
+    total_income = float(monthly_allowance or 0.0) + income
+    summary = {
+        "monthly_allowance": float(monthly_allowance or 0.0),
+        "total_income": total_income,
+        "total_expense": expense,
+        "net": total_income - expense,
+        "transaction_count": len(transactions),
+        "category_income": category_income,
+        "category_expense": category_expense,
+    }
+    if month_key:
+        summary["daily_net"] = daily_net(month_key, monthly_allowance, transactions)
+    return summary
+
+
+def daily_net(month_key: str, monthly_allowance: float, transactions: list) -> list:
+    """Net saved on each day of the month: the allowance spread evenly over its days, plus income, minus expenses."""
+    year, month = map(int, month_key.split("-"))
+    days = calendar.monthrange(year, month)[1]
+    first = date(year, month, 1)
+    net = [float(monthly_allowance or 0.0) / days] * days
+    for tx in transactions:
+        try:
+            # Entries dated outside the month count on its first or last day
+            position = min(max((date.fromisoformat(str(tx.get("date"))[:10]) - first).days, 0), days - 1)
+        except ValueError:
+            position = 0  # undated entries count from the start of the month
+        amount = float(tx.get("amount") or 0.0)
+        if tx.get("income_or_expenditure") == "Income":
+            net[position] += amount
+        elif tx.get("income_or_expenditure") == "Expenditure":
+            net[position] -= amount
+    return [round(value, 4) for value in net]
+
+
+def _summary_is_current(summary: dict) -> bool:
+    #Index entries written before per-category totals and daily nets existed get rebuilt from their month
+    return "category_expense" in summary and "net" in summary and "daily_net" in summary
+
+
+def _month_range(first: str, last: str):
+    year, month = map(int, first.split("-"))
+    while f"{year:04d}-{month:02d}" <= last:
+        yield f"{year:04d}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def build_savings_prefix(archive_index: dict) -> dict:
+    """
+    Cumulative net savings per day over the archived months: cumulative[i] is
+    everything saved from the first day of `start` through day i. Months missing
+    from the archive count as zero. Rebuilt whenever archive_index changes.
+    """
+    if not archive_index:
+        return {"start": None, "through": None, "months": 0, "cumulative": []}
+    months = sorted(archive_index)
+    running = 0.0
+    cumulative = []
+    for month_key in _month_range(months[0], months[-1]):
+        year, month = map(int, month_key.split("-"))
+        days = archive_index.get(month_key, {}).get("daily_net") or [0.0] * calendar.monthrange(year, month)[1]
+        for value in days:
+            running += value
+            cumulative.append(round(running, 4))
+    return {"start": months[0], "through": months[-1], "months": len(months), "cumulative": cumulative}
+
+
+def _prefix_is_current(prefix, archive_index: dict) -> bool:
+    if not prefix:
+        return False
+    return prefix.get("through") == (max(archive_index) if archive_index else None) and prefix.get("months") == len(archive_index)
+
+
+def combine_summaries(summaries) -> dict:
+    """Add up month summaries (e.g. archive_index values) into one cross-month total."""
+    total = summarize_month(0.0, [])
+    total["months"] = 0
+    for summary in summaries:
+        total["months"] += 1
+        for field in ("monthly_allowance", "total_income", "total_expense", "net", "transaction_count"):
+            total[field] += summary.get(field, 0)
+        for field in ("category_income", "category_expense"):
+            for category, amount in summary.get(field, {}).items():
+                total[field][category] = total[field].get(category, 0.0) + amount
+    return total
+
+
+def _to_columns(transactions: list) -> dict:
+    #List of records -> {field: [values...]}, the layout used by archive partitions
+    fields = []
+    for tx in transactions:
+        for field in tx:
+            if field not in fields:
+                fields.append(field)
+    return {field: [tx.get(field) for tx in transactions] for field in fields}
+
+
+def _from_columns(columns: dict) -> list:
+    fields = list(columns)
+    return [dict(zip(fields, row)) for row in zip(*columns.values())]
+
+
+def new_record_id() -> str:
+    """Persistent unique id given to a transaction when it is created."""
+    return uuid.uuid4().hex
+
+
+# Collections whose ids come from the ledger's own counter ("1", "2", ...) rather than uuids
+ALLOCATED_KEYS = ("savings_goals", "to_take", "to_give")
+
+
+def _next_free_id(data: dict) -> int:
+    #First counter value above every numeric id in use; older ids look like "3-1770499695" and never clash
+    used = [int(r["id"]) for key in ALLOCATED_KEYS for r in data.get(key, []) if str(r.get("id", "")).isdigit()]
+    return max(used, default=0) + 1
+
+
+def _allocate_ids(data: dict, op: str, key: str, value):
+    #Hand out counter ids to new goals and debt entries; called under the write lock after catching up,
+    #so two sessions can never draw the same number
+    if key not in ALLOCATED_KEYS:
+        return value
+    if op == "append" and not value.get("id"):
+        return {**value, "id": str(data.get("next_id", 1))}
+    if op == "assign_ids":
+        missing = sum(1 for r in data.get(key, []) if not r.get("id"))
+        return [str(data.get("next_id", 1) + n) for n in range(missing)]
+    return value
+
+
+def index_by_id(records: list) -> dict:
+    """Map record id -> position in `records`."""
+    return {record.get("id"): position for position, record in enumerate(records)}
+
+
+# id -> position indexes kept between changes, one per (ledger, collection) and tagged with the
+# version they describe, so a delete, update or record_map lookup finds its ids without indexing the
+# whole list. Every position is checked against the id found there before it is trusted.
+_POSITIONS = OrderedDict()
+_POSITIONS_LOCK = threading.Lock()
+
+
+def _take_positions(data: dict, key: str, ids: list) -> dict:
+    #The kept index of data[key] if it is for this version and finds every id, else a fresh one;
+    #taken out of the cache so only the caller updates it until _keep_positions puts it back
+    records = data.get(key, [])
+    with _POSITIONS_LOCK:
+        kept = _POSITIONS.pop((current_ledger(), key), None)
+    if kept is not None and kept[0] == data.get("version", 0):
+        index = kept[1]
+        if all((position := index.get(i)) is not None and position < len(records) and records[position].get("id") == i for i in ids):
+            return index
+    return index_by_id(records)
+
+
+def _keep_positions(key: str, version, index: dict) -> None:
+    with _POSITIONS_LOCK:
+        _POSITIONS[(current_ledger(), key)] = (version, index)
+        while len(_POSITIONS) > BACKEND_POOL_SIZE * (len(ALLOCATED_KEYS) + 1):  #Plus transactions
+            _POSITIONS.popitem(last=False)
+
+
+class RecordMap(Mapping):
+    """Read-only id -> record view of one collection; see record_map."""
+
+    def __init__(self, data: dict, key: str):
+        self._data = data
+        self._key = key
+
+    def __getitem__(self, record_id):
+        index = _take_positions(self._data, self._key, [record_id])
+        _keep_positions(self._key, self._data.get("version", 0), index)
+        position = index.get(record_id)
+        if position is None:
+            raise KeyError(record_id)
+        return self._data[self._key][position]
+
+    def __iter__(self):
+        return (record.get("id") for record in self._data.get(self._key, []))
+
+    def __len__(self) -> int:
+        return len(self._data.get(self._key, []))
+
+
+def record_map(data: dict, key: str) -> RecordMap:
+    """
+    id -> record for data[key]. Lookups go through the kept id -> position index,
+    which apply_change updates with every change rather than rebuilding it per
+    version, and always return the record from data[key] itself.
+    """
+    return RecordMap(data, key)
+
+
+def apply_change(data: dict, record: dict) -> None:
+    """Apply one change record to the in-memory ledger."""
+    op = record.get("op")
+    key = record.get("key")
+    removed, added = [], []
+    if op == "set":
+        data[key] = record.get("value")
+    elif op == "append":
+        records = data.setdefault(key, [])
+        records.append(record.get("value"))
+        added.append(record.get("value"))
+        with _POSITIONS_LOCK:
+            kept = _POSITIONS.pop((current_ledger(), key), None)
+        if kept is not None and kept[0] == data.get("version", 0):
+            kept[1][record["value"].get("id")] = len(records) - 1
+            _keep_positions(key, record.get("version", kept[0]), kept[1])
+    elif op == "delete":
+        # value: ids to remove; positions come from the kept id index, highest first so they stay valid.
+        # Only the records after the first removed one move, so only their positions are rewritten
+        ids = record.get("value", [])
+        records = data.get(key, [])
+        index = _take_positions(data, key, ids)
+        positions = sorted({index[i] for i in ids if i in index}, reverse=True)
+        for position in positions:
+            removed.append(records.pop(position))
+            index.pop(removed[-1].get("id"), None)
+        for position in range(positions[-1] if positions else len(records), len(records)):
+            index[records[position].get("id")] = position
+        _keep_positions(key, record.get("version", data.get("version", 0)), index)
+    elif op == "update":
+        # value: the full replacement record, matched on its id
+        records = data.get(key, [])
+        record_id = record["value"].get("id")
+        index = _take_positions(data, key, [record_id])
+        position = index.get(record_id)
+        if position is not None:
+            removed.append(records[position])
+            added.append(record["value"])
+            records[position] = record["value"]
+        _keep_positions(key, record.get("version", data.get("version", 0)), index)
+    elif op == "assign_ids":
+        # value: fresh ids handed out in order to records that predate ids
+        fresh_ids = iter(record.get("value", []))
+        records = data.get(key, [])
+        for position, existing in enumerate(records):
+            if not existing.get("id"):
+                records[position] = {**existing, "id": next(fresh_ids)}
+    if key in ALLOCATED_KEYS and op in ("append", "assign_ids"):
+        ids = [record["value"].get("id")] if op == "append" else record.get("value", [])
+        numeric = [int(i) for i in ids if str(i).isdigit()]
+        if numeric:
+            data["next_id"] = max(data.get("next_id", 1), max(numeric) + 1)
+    if key in DEBT_KEYS:
+        if op == "set":
+            data["balances"] = build_balances(data.get("to_take", []), data.get("to_give", []))
+        else:
+            _adjust_balances(data.setdefault("balances", {}), key, removed, added)
+    if "version" in record:
+        data["version"] = record["version"]
+
+
+# Parsed JSON ledgers shared by every session of this process, keyed on the data file path.
+# Each entry remembers the (mtime, size) of the snapshot and journal it was read from.
+_LOAD_CACHE = {}
+_LOAD_CACHE_LOCK = threading.Lock()
+CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the load_data cache since the process started."""
+    with _LOAD_CACHE_LOCK:
+        return dict(CACHE_STATS)
+
+
+# Logical changes recorded against physical journal writes; with write-behind one write carries many changes
+WRITE_STATS = {"changes": 0, "writes": 0, "last_batch": 0, "largest_batch": 0}
+_WRITE_STATS_LOCK = threading.Lock()
+_WRITE_BEHIND = weakref.WeakSet()  #JSON backends that may hold buffered changes
+
+
+def _count_write(changes: int) -> None:
+    with _WRITE_STATS_LOCK:
+        WRITE_STATS["changes"] += changes
+        WRITE_STATS["writes"] += 1
+        WRITE_STATS["last_batch"] = changes
+        WRITE_STATS["largest_batch"] = max(WRITE_STATS["largest_batch"], changes)
+
+
+def write_stats() -> dict:
+    """Changes recorded, journal writes made and changes per write (last and largest batch)."""
+    with _WRITE_STATS_LOCK:
+        return dict(WRITE_STATS)
+
+
+@atexit.register
+def flush_all() -> None:
+    """Write out every buffered change in this process; runs at interpreter exit."""
+    for backend in list(_WRITE_BEHIND):
+        backend.flush()
+
+
+def _fingerprints(transactions: list):
+    #Yield (date, category, type, payment mode, amount, occurrence) per transaction; occurrence numbers identical ones 1, 2, ...
+    seen = Counter()
+    for tx in transactions:
+        base = (
+            str(tx.get("date", ""))[:10], str(tx.get("category", "")), str(tx.get("income_or_expenditure", "")),
+            str(tx.get("payment_mode", "")), round(float(tx.get("amount") or 0.0), 2),
+        )
+        seen[base] += 1
+        yield (*base, seen[base])
+
+
+def new_import_rows(existing: list, rows: list) -> list:
+    """
+    The rows of an import that are not already in `existing` (one month's
+    transactions). The n-th identical row only counts as a duplicate if the
+    month already holds n of them, so importing the same file twice adds nothing
+    while two genuine identical purchases in one file both survive.
+    """
+    index = set(_fingerprints(existing))  # hash index of what the month already holds
+    return [row for row, fingerprint in zip(rows, _fingerprints(rows)) if fingerprint not in index]
+
+
+def _new_categories(data: dict, rows: list) -> list:
+    #Categories of imported rows the ledger does not list yet, in first-seen order
+    known = set(data.get("categories", []))
+    return [c for c in dict.fromkeys(str(row.get("category", "")) for row in rows) if c not in known]
+
+
+def _group_import(rows: list, current_month: str) -> tuple:
+    #Rows per month key, plus the count dated after the current month (those have nowhere to go)
+    by_month = {}
+    future = 0
+    for row in rows:
+        month_key = str(row.get("date", ""))[:7]
+        if month_key > current_month:
+            future += 1
+        else:
+            by_month.setdefault(month_key, []).append(row)
+    return by_month, future
+
+
+def _copy_view(data: dict) -> dict:
+    #Copy the containers so callers can append/replace freely; the records inside are shared
+    return {
+        key: list(value) if isinstance(value, list) else dict(value) if isinstance(value, dict) else value
+        for key, value in data.items()
+    }
+
+
+_UMASK = os.umask(0)  #Read once at import; os.umask can only be read by setting it
+os.umask(_UMASK)
+
+
+def _file_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _file_mode(path: str) -> int:
+    #Permissions a rewritten file should keep: the existing file's, or what open() would give a new one
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _atomic_write(path: str, text: str) -> None:
+    #Write to a temp file in the same directory, fsync it, then rename over the target
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".")
+    try:
+        # mkstemp creates the file 0600; keep the ledger readable by the other workers sharing it
+        os.chmod(tmp_path, _file_mode(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class JsonBackend:
+    """JSON snapshot plus append-only journal, see the module docstring."""
+
+    def __init__(self, data_file: str = DATA_FILE, write_behind: float = None):
+        self.data_file = data_file
+        self.journal_file = data_file + ".journal"  #One JSON record per line, replayed on top of the snapshot
+        self.lock_file = data_file + ".lock"  #Advisory lock serialising writers across processes
+        self.archive_dir = os.path.splitext(data_file)[0] + "_archives"  #One columnar JSON file per archived month
+        self.columns_dir = os.path.splitext(data_file)[0] + "_columns"  #Binary column store of the archive (see columnar.py)
+        self._thread_lock = threading.Lock()
+        self.write_behind = WRITE_BEHIND_SECONDS if write_behind is None else write_behind
+        self._pending = []  #Journal records applied in memory but not yet on disk, oldest first
+        self._latest = None  #The ledger including _pending
+        self._buffer = None  #Token of the current batch; copies holding buffered versions carry it under BUFFER_KEY
+        self._rebased = set()  #Tokens of batches renumbered by a conflicting flush
+        self._pending_lock = threading.RLock()
+        self._timer = None
+
+    @contextmanager
+    def _lock(self, shared: bool = False):
+        """
+        Advisory lock on lock_file shared by every process using the same data directory.
+
+        Writers take it exclusively; readers take it shared so they never see a snapshot
+        and journal from two different compactions. Readers never create the file: until a
+        writer has made it there is no lock to wait for, and read-only ledgers stay untouched.
+        Without fcntl (Windows) only threads of this process are serialised.
+        """
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+        if shared and not os.path.exists(self.lock_file):
+            yield
+            return
+        with open(self.lock_file, "r" if shared else "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_journal(self) -> list:
+        #Return the journal records in order; a torn last line (crash mid-append) is ignored
+        if not os.path.exists(self.journal_file):
+            return []
+        records = []
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return records
+
+    def _read_snapshot(self) -> dict:
+        if not os.path.exists(self.data_file):
+            # Initial default states
+            return _default_data(list(DEFAULT_CATEGORIES))
+        try:
+            with open(self.data_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            # Keep the damaged files for inspection so the next save cannot silently wipe them
+            suffix = ".corrupt-" + datetime.now().strftime("%Y%m%d%H%M%S")
+            os.replace(self.data_file, self.data_file + suffix)
+            if os.path.exists(self.journal_file):
+                os.replace(self.journal_file, self.journal_file + suffix)
+            return _default_data([])
+        except OSError:
+            # If file is unreadable, fall back to default structure
+            return _default_data([])
+        return _ensure_keys(data)
+
+    def _replay(self, data: dict, records: list) -> None:
+        #Apply journal records newer than the version already reflected in `data`
+        for record in records:
+            if record.get("op") != "base" and record.get("version", 0) > data["version"]:
+                apply_change(data, record)
+
+    def _read_state(self) -> dict:
+        data = self._read_snapshot()
+        self._replay(data, self._read_journal())
+        return data
+
+    def _last_journal_version(self):
+        #Version of the newest complete journal record, or None when it holds none. Read backwards in a
+        #growing window, so a record longer than one window (an assign_ids backfill, a large categories
+        #set) is read whole instead of being skipped for an older one; a torn last line is skipped as
+        #_read_journal skips it.
+        with open(self.journal_file, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            window, carry = 4096, b""
+            while end > 0:
+                start = max(end - window, 0)
+                f.seek(start)
+                lines = (f.read(end - start) + carry).split(b"\n")
+                end = start
+                # Above the start of the file the first piece may be the tail of a longer line
+                carry = lines.pop(0) if end > 0 else b""
+                for line in reversed(lines):
+                    if not line.strip():
+                        continue
+                    try:
+                        return int(json.loads(line)["version"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                window *= 2
+        return None
+
+    def _disk_version(self) -> int:
+        #The journal always ends with the newest version; only a ledger without a complete journal record
+        #is at its snapshot's version (exactly what _read_state would return)
+        if os.path.exists(self.journal_file):
+            version = self._last_journal_version()
+            if version is not None:
+                return version
+        if os.path.exists(self.data_file):
+            return self._read_snapshot()["version"]
+        return 0
+
+    def _catch_up(self, data: dict) -> None:
+        #Bring a stale in-memory ledger up to the on-disk version (caller holds the lock)
+        version = data.get("version", 0)
+        if self._disk_version() == version:
+            return
+        records = self._read_journal()
+        base = records[0].get("version", 0) if records and records[0].get("op") == "base" else 0
+        if records and base <= version <= records[-1].get("version", 0):
+            self._replay(data, records)
+        else:
+            fresh = self._read_state()
+            data.clear()
+            data.update(fresh)
+
+    def _write_snapshot(self, data: dict) -> None:
+        #Fold everything into the snapshot, then reset the journal to a single base marker (caller holds the lock)
+        _atomic_write(self.data_file, json.dumps(data, indent=2, ensure_ascii=False))
+        _atomic_write(self.journal_file, json.dumps({"op": "base", "version": data["version"]}) + "\n")
+
+    def _partition_path(self, month_key: str) -> str:
+        return os.path.join(self.archive_dir, f"{month_key}.json")
+
+    def _write_partition(self, month_key: str, monthly_allowance: float, transactions: list) -> dict:
+        #Write one archived month and return its archive_index entry (caller holds the lock)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        partition = {
+            "month": month_key,
+            "monthly_allowance": float(monthly_allowance or 0.0),
+            "columns": _to_columns(transactions),
+        }
+        _atomic_write(self._partition_path(month_key), json.dumps(partition, ensure_ascii=False))
+        return summarize_month(monthly_allowance, transactions, month_key)
+
+    def _migrate_archives(self) -> None:
+        #Move months nested under "archives" by older versions out into partition files
+        self.flush()
+        with self._lock():
+            data = self._read_state()
+            if "archives" not in data:
+                return
+            for month_key, month_data in data.pop("archives").items():
+                data["archive_index"][month_key] = self._write_partition(
+                    month_key, month_data.get("monthly_allowance", 0.0), month_data.get("transactions", [])
+                )
+            data["savings_prefix"] = build_savings_prefix(data["archive_index"])
+            data["version"] += 1
+            self._write_snapshot(data)
+
+    def _reindex_archives(self) -> None:
+        #Rebuild archive_index entries that predate the current summary layout, and the savings prefix over them
+        self.flush()
+        with self._lock():
+            data = self._read_state()
+            stale = [m for m, summary in data["archive_index"].items() if not _summary_is_current(summary)]
+            if not stale and _prefix_is_current(data.get("savings_prefix"), data["archive_index"]):
+                return
+            for month_key in stale:
+                month = self.load_archive(data, month_key)
+                data["archive_index"][month_key] = summarize_month(month["monthly_allowance"], month["transactions"], month_key)
+            data["savings_prefix"] = build_savings_prefix(data["archive_index"])
+            data["version"] += 1
+            self._write_snapshot(data)
+
+    def _signature(self) -> tuple:
+        return (_file_signature(self.data_file), _file_signature(self.journal_file))
+
+    def _remember(self, data: dict) -> None:
+        #Refresh the shared cache with what was just written (caller holds the lock)
+        with _LOAD_CACHE_LOCK:
+            _LOAD_CACHE[os.path.abspath(self.data_file)] = (self._signature(), _copy_view(data))
+
+    def load(self) -> dict:
+        key = os.path.abspath(self.data_file)
+        signature = self._signature()
+        with _LOAD_CACHE_LOCK:
+            cached = _LOAD_CACHE.get(key)
+            if cached is not None and cached[0] == signature:
+                CACHE_STATS["hits"] += 1
+                return _copy_view(cached[1])
+            CACHE_STATS["misses"] += 1
+
+        # Someone else changed the files: put our buffered changes on top before reading them back
+        self.flush()
+        with self._lock(shared=True):
+            signature = self._signature()
+            data = self._read_state()
+        if "archives" in data:
+            self._migrate_archives()
+            return self.load()
+        if not (all(_summary_is_current(summary) for summary in data["archive_index"].values())
+                and _prefix_is_current(data.get("savings_prefix"), data["archive_index"])):
+            self._reindex_archives()
+            return self.load()
+        backfilled = False
+        missing_ids = sum(1 for tx in data["transactions"] if not tx.get("id"))
+        if missing_ids:
+            # Transactions from before ids existed get one, persisted so it stays stable
+            self.record(data, "assign_ids", "transactions", [new_record_id() for _ in range(missing_ids)])
+            backfilled = True
+        for collection in ALLOCATED_KEYS:
+            if any(not r.get("id") for r in data[collection]):
+                # Same for goals and debt entries, numbered by the counter
+                self.record(data, "assign_ids", collection)
+                backfilled = True
+        if backfilled:
+            return data
+        with _LOAD_CACHE_LOCK:
+            _LOAD_CACHE[key] = (signature, _copy_view(data))
+        return data
+
+    def save(self, data: dict) -> None:
+        self.flush()
+        with self._lock():
+            self._settle(data)
+            data["version"] = max(data.get("version", 0), self._disk_version()) + 1
+            self._write_snapshot(data)
+            self._remember(data)
+
+    def _append_journal(self, data: dict, records: list) -> None:
+        #One append and one fsync for any number of records (caller holds the lock)
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.getsize(self.journal_file) >= JOURNAL_COMPACT_BYTES:
+            self._write_snapshot(data)
+        self._remember(data)
+        _count_write(len(records))
+
+    def _settle(self, data: dict) -> None:
+        #Make a copy that held buffered changes safe to catch up (caller holds the lock and nothing is pending).
+        #Its versions are real unless a conflicting flush renumbered them; then it is reloaded, as replaying the
+        #journal by version would skip the other writer's records and repeat ours.
+        token = data.pop(BUFFER_KEY, None)
+        if token is not None and token in self._rebased:
+            fresh = self._read_state()
+            data.clear()
+            data.update(fresh)
+
+    def record(self, data: dict, op: str, key: str, value=None) -> None:
+        if self.write_behind <= 0 or key in ALLOCATED_KEYS or op == "assign_ids":
+            # Counter ids must be drawn under the write lock (see _allocate_ids), and backfilled ids must match what
+            # every other session backfilled, so those changes are never buffered
+            self.flush()
+            with self._lock():
+                self._settle(data)
+                self._catch_up(data)
+                value = _allocate_ids(data, op, key, value)
+                record = {"op": op, "key": key, "value": value, "version": data.get("version", 0) + 1}
+                apply_change(data, record)
+                self._append_journal(data, [record])
+            return
+
+        # Write-behind: apply now, keep the record in memory and let flush() write the batch
+        with self._pending_lock:
+            if self._pending:
+                if data.get(BUFFER_KEY) != self._buffer or data.get("version") != self._latest["version"]:
+                    data.clear()
+                    data.update(_copy_view(self._latest))
+            else:
+                with self._lock(shared=True):
+                    self._settle(data)
+                    self._catch_up(data)
+                self._buffer = uuid.uuid4().hex
+            record = {"op": op, "key": key, "value": value, "version": data.get("version", 0) + 1}
+            apply_change(data, record)
+            data[BUFFER_KEY] = self._buffer
+            self._pending.append(record)
+            self._latest = _copy_view(data)
+            # The files are unchanged, so every session of this process now loads the buffered state
+            self._remember(data)
+            _WRITE_BEHIND.add(self)
+            if len(self._pending) >= WRITE_BEHIND_MAX:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.write_behind, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write every buffered change to the journal in one append."""
+        with self._pending_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, data = self._pending, self._latest
+            data.pop(BUFFER_KEY, None)
+            with self._lock():
+                if self._disk_version() != pending[0]["version"] - 1:
+                    # Another process wrote meanwhile: replay our changes on top of its state. Copies that
+                    # still hold our provisional versions are reloaded the next time they are used (_settle).
+                    data = self._read_state()
+                    for record in pending:
+                        record["version"] = data["version"] + 1
+                        apply_change(data, record)
+                    self._rebased.add(self._buffer)
+                self._append_journal(data, pending)
+            self._pending, self._latest = [], None
+
+    def rollover(self, data: dict, today_month: str) -> None:
+        self.flush()
+        with self._lock():
+            # Another session may already have rolled the month over
+            self._settle(data)
+            self._catch_up(data)
+            stored_month = data.get("current_month", today_month)
+            if stored_month == today_month:
+                return
+
+            # Archive previous month data into its own partition file
+            previous_month_key = stored_month
+            # Only archive if there is anything meaningful
+            if data.get("transactions") or data.get("monthly_allowance", 0) != 0:
+                data["archive_index"][previous_month_key] = self._write_partition(
+                    previous_month_key, data.get("monthly_allowance", 0.0), data.get("transactions", [])
+                )
+                data["savings_prefix"] = build_savings_prefix(data["archive_index"])
+
+            # Start a new month, keeping the same categories and allowance
+            data["current_month"] = today_month
+            data["transactions"] = []
+
+            # Persist change immediately so that refreshes see the new month
+            data["version"] = data.get("version", 0) + 1
+            self._write_snapshot(data)
+            self._remember(data)
+
+    def import_transactions(self, data: dict, rows: list) -> dict:
+        self.flush()
+        with self._lock():
+            self._settle(data)
+            self._catch_up(data)
+            by_month, future = _group_import(rows, data["current_month"])
+            imported = []
+            for month_key, month_rows in sorted(by_month.items()):
+                if month_key == data["current_month"]:
+                    new = [{"id": new_record_id(), **row} for row in new_import_rows(data["transactions"], month_rows)]
+                    data["transactions"] = data["transactions"] + new
+                else:
+                    month = self.load_archive(data, month_key)
+                    new = [{"id": new_record_id(), **row} for row in new_import_rows(month["transactions"], month_rows)]
+                    if new:
+                        data["archive_index"][month_key] = self._write_partition(
+                            month_key, month["monthly_allowance"], month["transactions"] + new
+                        )
+                imported.extend(new)
+            added = len(imported)
+            if added:
+                # The whole batch lands in one snapshot write
+                data["categories"] = data["categories"] + _new_categories(data, imported)
+                data["savings_prefix"] = build_savings_prefix(data["archive_index"])
+                data["version"] = data.get("version", 0) + 1
+                self._write_snapshot(data)
+                self._remember(data)
+            return {"added": added, "duplicates": len(rows) - future - added, "future": future, "months": sorted(by_month)}
+
+    def archive_months(self, data: dict) -> list:
+        return list(data.get("archive_index", {}).keys())
+
+    def archive_signature(self, data: dict) -> str:
+        #Partitions are only ever replaced whole, so their (mtime, size) identify the archive's content
+        months = sorted(data.get("archive_index", {}))
+        stats = [(month_key, _file_signature(self._partition_path(month_key))) for month_key in months]
+        return hashlib.sha1(json.dumps(stats).encode("utf-8")).hexdigest()
+
+    def load_archive(self, data: dict, month_key: str) -> dict:
+        try:
+            with open(self._partition_path(month_key), "r", encoding="utf-8") as f:
+                partition = json.load(f)
+        except FileNotFoundError:
+            return {"monthly_allowance": 0.0, "transactions": []}
+        return {
+            "monthly_allowance": float(partition.get("monthly_allowance", 0.0)),
+            "transactions": _from_columns(partition.get("columns", {})),
+        }
+
+
+# Column layout of each list collection in the sqlite backend
+_SQLITE_COLUMNS = {
+    "transactions": ["id", "date", "category", "income_or_expenditure", "payment_mode", "amount"],
+    "savings_goals": ["id", "name", "target_amount", "target_date", "created_date"],
+    "to_take": ["id", "person", "amount", "description", "date"],
+    "to_give": ["id", "person", "amount", "description", "date"],
+}
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS categories (position INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS archives (month TEXT PRIMARY KEY, monthly_allowance REAL NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS month_summaries (month TEXT PRIMARY KEY, summary TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS transactions (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    month TEXT NOT NULL,
+    id TEXT,
+    date TEXT,
+    category TEXT,
+    income_or_expenditure TEXT,
+    payment_mode TEXT,
+    amount REAL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_month_date ON transactions (month, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_month_category ON transactions (month, category);
+CREATE INDEX IF NOT EXISTS idx_transactions_id ON transactions (id);
+CREATE TABLE IF NOT EXISTS savings_goals (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT, name TEXT, target_amount REAL, target_date TEXT, created_date TEXT
+);
+CREATE TABLE IF NOT EXISTS to_take (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT, person TEXT, amount REAL, description TEXT, date TEXT
+);
+CREATE TABLE IF NOT EXISTS to_give (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT, person TEXT, amount REAL, description TEXT, date TEXT
+);
+"""
+
+
+class SqliteBackend:
+    """
+    SQLite ledger. Each change is one short transaction; BEGIN IMMEDIATE takes the
+    database write lock so concurrent writers queue instead of overwriting.
+    """
+
+    def __init__(self, db_file: str = SQLITE_FILE):
+        self.db_file = db_file
+        self.columns_dir = os.path.splitext(db_file)[0] + "_columns"  #Binary column store of the archive (see columnar.py)
+        self._initialised = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialised:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(transactions)")]
+            if columns and "id" not in columns:
+                # Databases created before transaction ids: add the column and backfill it
+                conn.execute("ALTER TABLE transactions ADD COLUMN id TEXT")
+                conn.execute("UPDATE transactions SET id = lower(hex(randomblob(16))) WHERE id IS NULL")
+            conn.executescript(_SQLITE_SCHEMA)
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'current_month'").fetchone() is None:
+                # Fresh database: same starting point as a missing JSON file
+                self._write_meta(conn, "current_month", get_current_month_key())
+                self._write_meta(conn, "monthly_allowance", 0.0)
+                self._write_meta(conn, "version", 0)
+                conn.executemany("INSERT INTO categories (name) VALUES (?)", [(c,) for c in DEFAULT_CATEGORIES])
+            self._initialised = True
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _read_meta(conn: sqlite3.Connection) -> dict:
+        return {row["key"]: json.loads(row["value"]) for row in conn.execute("SELECT key, value FROM meta")}
+
+    @staticmethod
+    def _write_meta(conn: sqlite3.Connection, key: str, value) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    @staticmethod
+    def _rows(conn: sqlite3.Connection, table: str, where: str = "", params: tuple = ()) -> list:
+        columns = ", ".join(_SQLITE_COLUMNS[table])
+        sql = f"SELECT {columns} FROM {table} {where} ORDER BY position"
+        return [dict(row) for row in conn.execute(sql, params)]
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, table: str, records: list, month: str = None) -> None:
+        columns = _SQLITE_COLUMNS[table]
+        if table == "transactions":
+            sql = f"INSERT INTO transactions (month, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})"
+            conn.executemany(sql, [(month, *[r.get(c) for c in columns]) for r in records])
+        else:
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            conn.executemany(sql, [tuple(r.get(c) for c in columns) for r in records])
+
+    def _read_state(self, conn: sqlite3.Connection) -> dict:
+        meta = self._read_meta(conn)
+        month = meta.get("current_month", get_current_month_key())
+        data = _default_data([row["name"] for row in conn.execute("SELECT name FROM categories ORDER BY position")])
+        archive_index = self._archive_index(conn)
+        prefix = meta.get("savings_prefix")
+        if not _prefix_is_current(prefix, archive_index):
+            prefix = self._store_prefix(conn, archive_index)
+        data.update({
+            "current_month": month,
+            "monthly_allowance": float(meta.get("monthly_allowance", 0.0)),
+            "version": int(meta.get("version", 0)),
+            "transactions": self._rows(conn, "transactions", "WHERE month = ?", (month,)),
+            "savings_goals": self._rows(conn, "savings_goals"),
+            "to_take": self._rows(conn, "to_take"),
+            "to_give": self._rows(conn, "to_give"),
+            "archive_index": archive_index,
+            "savings_prefix": prefix,
+        })
+        data["balances"] = build_balances(data["to_take"], data["to_give"])
+        # A ledger imported from JSON may hold numeric ids beyond the stored counter
+        data["next_id"] = max(int(meta.get("next_id", 1)), _next_free_id(data))
+        return data
+
+    def _store_prefix(self, conn: sqlite3.Connection, archive_index: dict) -> dict:
+        prefix = build_savings_prefix(archive_index)
+        self._write_meta(conn, "savings_prefix", prefix)
+        return prefix
+
+    def _store_summary(self, conn: sqlite3.Connection, month_key: str) -> dict:
+        #Recompute one archived month's summary from its rows and persist it
+        row = conn.execute("SELECT monthly_allowance FROM archives WHERE month = ?", (month_key,)).fetchone()
+        summary = summarize_month(
+            float(row["monthly_allowance"]) if row else 0.0,
+            self._rows(conn, "transactions", "WHERE month = ?", (month_key,)),
+            month_key,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO month_summaries (month, summary) VALUES (?, ?)",
+            (month_key, json.dumps(summary, ensure_ascii=False)),
+        )
+        # Every change to archived rows ends here, so this marks the archive as changed for archive_signature
+        self._write_meta(conn, "archive_revision", uuid.uuid4().hex)
+        return summary
+
+    def _archive_index(self, conn: sqlite3.Connection) -> dict:
+        #Persisted per-month summaries; archived transactions themselves stay in the database
+        rows = conn.execute(
+            "SELECT a.month, s.summary FROM archives a LEFT JOIN month_summaries s ON s.month = a.month ORDER BY a.month"
+        )
+        index = {}
+        for row in rows.fetchall():
+            summary = json.loads(row["summary"]) if row["summary"] else None
+            if summary is None or not _summary_is_current(summary):
+                # Archived before summaries were stored: build it once
+                summary = self._store_summary(conn, row["month"])
+            index[row["month"]] = summary
+        return index
+
+    def _catch_up(self, conn: sqlite3.Connection, data: dict) -> None:
+        version = int(self._read_meta(conn).get("version", 0))
+        if version != data.get("version", 0):
+            fresh = self._read_state(conn)
+            data.clear()
+            data.update(fresh)
+
+    def _apply_sql(self, conn: sqlite3.Connection, data: dict, op: str, key: str, value) -> None:
+        if key in ("current_month", "monthly_allowance"):
+            self._write_meta(conn, key, value)
+        elif key == "categories":
+            if op == "set":
+                conn.execute("DELETE FROM categories")
+            names = value if op == "set" else [value]
+            conn.executemany("INSERT INTO categories (name) VALUES (?)", [(n,) for n in names])
+        elif key in _SQLITE_COLUMNS and op == "delete":
+            conn.executemany(f"DELETE FROM {key} WHERE id = ?", [(i,) for i in value])
+        elif key in _SQLITE_COLUMNS and op == "update":
+            columns = [c for c in _SQLITE_COLUMNS[key] if c != "id"]
+            assignments = ", ".join(f"{c} = ?" for c in columns)
+            conn.execute(f"UPDATE {key} SET {assignments} WHERE id = ?", (*[value.get(c) for c in columns], value["id"]))
+        elif key in _SQLITE_COLUMNS:
+            month = data["current_month"]
+            if op == "set":
+                if key == "transactions":
+                    conn.execute("DELETE FROM transactions WHERE month = ?", (month,))
+                else:
+                    conn.execute(f"DELETE FROM {key}")
+            self._insert(conn, key, value if op == "set" else [value], month)
+        else:
+            raise ValueError(f"sqlite backend cannot store key {key!r}")
+
+    def load(self) -> dict:
+        conn = self._connect()
+        try:
+            return self._read_state(conn)
+        finally:
+            conn.close()
+
+    def save(self, data: dict) -> None:
+        with self._write() as conn:
+            version = max(data.get("version", 0), int(self._read_meta(conn).get("version", 0))) + 1
+            for key in ("current_month", "monthly_allowance", "categories", *_SQLITE_COLUMNS):
+                self._apply_sql(conn, data, "set", key, data.get(key))
+            # Only present when importing from a JSON ledger
+            for month_key, month_data in data.get("archives", {}).items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO archives (month, monthly_allowance) VALUES (?, ?)",
+                    (month_key, float(month_data.get("monthly_allowance", 0.0))),
+                )
+                conn.execute("DELETE FROM transactions WHERE month = ?", (month_key,))
+                self._insert(conn, "transactions", month_data.get("transactions", []), month_key)
+                self._store_summary(conn, month_key)
+            if data.get("archives"):
+                self._store_prefix(conn, self._archive_index(conn))
+            self._write_meta(conn, "version", version)
+            data["version"] = version
+
+    def record(self, data: dict, op: str, key: str, value=None) -> None:
+        with self._write() as conn:
+            self._catch_up(conn, data)
+            value = _allocate_ids(data, op, key, value)
+            record = {"op": op, "key": key, "value": value, "version": data.get("version", 0) + 1}
+            archived = []
+            if key == "transactions" and op in ("delete", "update") and value:
+                # Ids are global, so an edit may reach an archived month whose summary must follow
+                ids = value if op == "delete" else [value["id"]]
+                archived = [
+                    row["month"] for row in conn.execute(
+                        f"SELECT DISTINCT month FROM transactions WHERE month != ? AND id IN ({', '.join('?' * len(ids))})",
+                        (data["current_month"], *ids),
+                    )
+                ]
+            self._apply_sql(conn, data, op, key, value)
+            for month_key in archived:
+                data["archive_index"][month_key] = self._store_summary(conn, month_key)
+            if archived:
+                data["savings_prefix"] = self._store_prefix(conn, data["archive_index"])
+            self._write_meta(conn, "version", record["version"])
+            apply_change(data, record)
+            if key in ALLOCATED_KEYS:
+                self._write_meta(conn, "next_id", data["next_id"])
+
+    def rollover(self, data: dict, today_month: str) -> None:
+        with self._write() as conn:
+            # Another session may already have rolled the month over
+            self._catch_up(conn, data)
+            stored_month = data.get("current_month", today_month)
+            if stored_month == today_month:
+                return
+
+            # Transactions already carry their month, so archiving only records the allowance
+            if data.get("transactions") or data.get("monthly_allowance", 0) != 0:
+                conn.execute(
+                    "INSERT OR REPLACE INTO archives (month, monthly_allowance) VALUES (?, ?)",
+                    (stored_month, float(data.get("monthly_allowance", 0.0))),
+                )
+                data["archive_index"][stored_month] = self._store_summary(conn, stored_month)
+                data["savings_prefix"] = self._store_prefix(conn, data["archive_index"])
+            version = data.get("version", 0) + 1
+            self._write_meta(conn, "current_month", today_month)
+            self._write_meta(conn, "version", version)
+            data.update({"current_month": today_month, "transactions": [], "version": version})
+
+    def import_transactions(self, data: dict, rows: list) -> dict:
+        with self._write() as conn:
+            self._catch_up(conn, data)
+            by_month, future = _group_import(rows, data["current_month"])
+            imported = []
+            archived = False
+            for month_key, month_rows in sorted(by_month.items()):
+                new = [
+                    {"id": new_record_id(), **row}
+                    for row in new_import_rows(self._rows(conn, "transactions", "WHERE month = ?", (month_key,)), month_rows)
+                ]
+                if not new:
+                    continue
+                self._insert(conn, "transactions", new, month_key)
+                if month_key == data["current_month"]:
+                    data["transactions"] = data["transactions"] + new
+                else:
+                    conn.execute("INSERT OR IGNORE INTO archives (month, monthly_allowance) VALUES (?, 0.0)", (month_key,))
+                    data["archive_index"][month_key] = self._store_summary(conn, month_key)
+                    archived = True
+                imported.extend(new)
+            added = len(imported)
+            if archived:
+                data["savings_prefix"] = self._store_prefix(conn, data["archive_index"])
+            if added:
+                categories = _new_categories(data, imported)
+                conn.executemany("INSERT INTO categories (name) VALUES (?)", [(c,) for c in categories])
+                data["categories"] = data["categories"] + categories
+                data["version"] = data.get("version", 0) + 1
+                self._write_meta(conn, "version", data["version"])
+            return {"added": added, "duplicates": len(rows) - future - added, "future": future, "months": sorted(by_month)}
+
+    def archive_months(self, data: dict) -> list:
+        return list(data.get("archive_index", {}).keys())
+
+    def archive_signature(self, data: dict) -> str:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'archive_revision'").fetchone()
+        finally:
+            conn.close()
+        revision = json.loads(row["value"]) if row else None
+        return hashlib.sha1(json.dumps([revision, sorted(data.get("archive_index", {}))]).encode("utf-8")).hexdigest()
+
+    def load_archive(self, data: dict, month_key: str) -> dict:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT monthly_allowance FROM archives WHERE month = ?", (month_key,)).fetchone()
+            return {
+                "monthly_allowance": float(row["monthly_allowance"]) if row else 0.0,
+                "transactions": self._rows(conn, "transactions", "WHERE month = ?", (month_key,)),
+            }
+        finally:
+            conn.close()
+
+
+_BACKEND = None
+
+# Per-user backends, most recently used last
+_POOL = OrderedDict()
+_POOL_LOCK = threading.Lock()
+POOL_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Ledger the current rerun works on; each Streamlit session runs its script in its own thread
+_CURRENT_USER = contextvars.ContextVar("finance_user", default=None)
+_USER_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+
+def _make_backend(data_file: str, sqlite_file: str):
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(sqlite_file)
+    if STORAGE_BACKEND == "json":
+        return JsonBackend(data_file)
+    raise ValueError(f"Unknown FINANCE_STORAGE backend: {STORAGE_BACKEND!r}")
+
+
+def user_ledger_dir(user_key: str, users_dir: str = None) -> str:
+    """Directory holding one user's ledger, sharded by a hash of the key."""
+    if not _USER_KEY_PATTERN.match(user_key or "") or user_key.strip(".") == "":
+        raise ValueError(f"Invalid user key: {user_key!r}")
+    shard = hashlib.sha1(user_key.encode("utf-8")).hexdigest()[:2]
+    return os.path.join(users_dir or USERS_DIR, shard, user_key)
+
+
+def use_ledger(user_key) -> None:
+    """
+    Point this rerun's storage calls at `user_key`'s ledger (None: the shared one).
+
+    Only meaningful when USERS_DIR is set. Call it at the top of every rerun,
+    before load_data.
+    """
+    if user_key is not None:
+        user_ledger_dir(user_key, USERS_DIR or ".")  # validate early
+    _CURRENT_USER.set(user_key)
+
+
+def current_ledger():
+    """User key set by use_ledger for this rerun, or None for the shared ledger."""
+    return _CURRENT_USER.get() if USERS_DIR else None
+
+
+def _evict(backend) -> None:
+    #Forget everything this process keeps for a user that fell out of the pool
+    if isinstance(backend, JsonBackend):
+        backend.flush()
+        with _LOAD_CACHE_LOCK:
+            _LOAD_CACHE.pop(os.path.abspath(backend.data_file), None)
+
+
+def get_backend():
+    """Return the backend for the current ledger (see use_ledger), creating it on first use."""
+    global _BACKEND
+    user_key = current_ledger()
+    if user_key is None:
+        if _BACKEND is None:
+            _BACKEND = _make_backend(DATA_FILE, SQLITE_FILE)
+        return _BACKEND
+
+    evicted = []
+    with _POOL_LOCK:
+        backend = _POOL.get(user_key)
+        if backend is not None:
+            _POOL.move_to_end(user_key)
+            POOL_STATS["hits"] += 1
+            return backend
+        POOL_STATS["misses"] += 1
+        directory = user_ledger_dir(user_key)
+        os.makedirs(directory, exist_ok=True)
+        backend = _POOL[user_key] = _make_backend(
+            os.path.join(directory, os.path.basename(DATA_FILE)), os.path.join(directory, os.path.basename(SQLITE_FILE))
+        )
+        while len(_POOL) > BACKEND_POOL_SIZE:
+            evicted.append(_POOL.popitem(last=False)[1])
+            POOL_STATS["evictions"] += 1
+    for old in evicted:
+        _evict(old)
+    return backend
+
+
+def pool_stats() -> dict:
+    """Open per-user backends and hit/miss/eviction counters of the pool."""
+    with _POOL_LOCK:
+        return {"open": len(_POOL), **POOL_STATS}
+
+
+_COMMIT_LISTENERS = []
+
+
+def on_commit(listener) -> None:
+    """
+    Call listener(user_key, data) after every save, change, rollover or import.
+
+    data is a private shallow copy of the ledger as committed; listeners must
+    not mutate its records and should hand slow work to another thread.
+    """
+    if listener not in _COMMIT_LISTENERS:
+        _COMMIT_LISTENERS.append(listener)
+
+
+def _committed(data: dict) -> None:
+    for listener in _COMMIT_LISTENERS:
+        listener(current_ledger(), _copy_view(data))
+
+
+def load_data() -> dict:
+    return get_backend().load()
+
+
+def save_data(data: dict) -> None:
+    """Write the whole of `data`, replacing whatever is stored."""
+    get_backend().save(data)
+    _committed(data)
+
+
+def record_change(data: dict, op: str, key: str, value=None) -> None:
+    """
+    Apply a change to `data` and persist just that change.
+
+    op is "set" (replace data[key]), "append" (add value to the list data[key]),
+    "delete" (remove the records whose id is in value) or "update" (replace the
+    record with value's id by value). If another session wrote since `data` was
+    loaded, its changes are picked up first so concurrent writers serialise
+    instead of overwriting each other.
+    """
+    get_backend().record(data, op, key, value)
+    _committed(data)
+
+
+def rollover_month_if_needed(data: dict) -> dict:
+
+    today_month = get_current_month_key()
+    if data.get("current_month", today_month) != today_month:
+        get_backend().rollover(data, today_month)
+        _committed(data)
+    return data
+
+
+def import_transactions(data: dict, rows: list) -> dict:
+    """
+    Add many transactions at once (e.g. a bank export) in a single write.
+
+    Each row ({date, category, income_or_expenditure, payment_mode, amount})
+    goes to the current month or to the archived month of its date; rows
+    already in that month are skipped (see new_import_rows), so re-importing a
+    file is harmless. Rows dated after the current month are not imported, and
+    categories the ledger does not list yet are added to it.
+    Returns {added, duplicates, future, months}.
+    """
+    result = get_backend().import_transactions(data, rows)
+    if result["added"]:
+        _committed(data)
+    return result
+
+
+def list_archive_months(data: dict) -> list:
+    """Month keys ('YYYY-MM') that have archived data."""
+    return get_backend().archive_months(data)
+
+
+def archive_summaries(data: dict) -> dict:
+    """Summary of every archived month ({month_key: summarize_month(...)}), read from the index only."""
+    return dict(data.get("archive_index", {}))
+
+
+def load_archive_month(data: dict, month_key: str) -> dict:
+    """Return {monthly_allowance, transactions} for one archived month."""
+    return get_backend().load_archive(data, month_key)
+
+
+def archive_signature(data: dict) -> str:
+    """Digest that changes whenever any archived transaction does; keys caches of the whole archive."""
+    return get_backend().archive_signature(data)
+
+
+def archive_columns_dir() -> str:
+    """Directory holding the current ledger's binary column store (see columnar.py)."""
+    return get_backend().columns_dir
+
+
+def _read_json_ledger(path: str) -> tuple:
+    #(ledger, {month_key: {monthly_allowance, transactions}}) without changing anything on disk
+    backend = JsonBackend(path)
+    with backend._lock(shared=True):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = _ensure_keys(json.load(f))  # a damaged snapshot raises instead of being moved aside
+        else:
+            data = _default_data(list(DEFAULT_CATEGORIES))
+        backend._replay(data, backend._read_journal())
+    archives = dict(data.pop("archives", {}))  # legacy nested layout
+    for month_key in data.get("archive_index", {}):
+        archives[month_key] = backend.load_archive(data, month_key)
+    return data, archives
+
+
+def _read_sqlite_ledger(path: str) -> tuple:
+    #Same for a database, opened read-only: no WAL switch, schema upgrade, id backfill or summary writes
+    conn = sqlite3.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        meta = {
+            row["key"]: json.loads(row["value"])
+            for row in conn.execute("SELECT key, value FROM meta WHERE key IN ('current_month', 'monthly_allowance')")
+        }
+        present = {row["name"] for row in conn.execute("PRAGMA table_info(transactions)")}
+        columns = [c for c in _SQLITE_COLUMNS["transactions"] if c in present]
+        by_month = {}
+        for row in conn.execute(f"SELECT month, {', '.join(columns)} FROM transactions ORDER BY position"):
+            by_month.setdefault(row["month"], []).append({c: row[c] for c in columns})
+        archives = {
+            row["month"]: {"monthly_allowance": float(row["monthly_allowance"]), "transactions": by_month.get(row["month"], [])}
+            for row in conn.execute("SELECT month, monthly_allowance FROM archives")
+        }
+    finally:
+        conn.close()
+    current_month = meta.get("current_month", get_current_month_key())
+    data = {
+        "current_month": current_month,
+        "monthly_allowance": float(meta.get("monthly_allowance", 0.0)),
+        "transactions": by_month.get(current_month, []),
+    }
+    return data, archives
+
+
+def read_ledger_months(path: str):
+    """
+    Yield (month_key, monthly_allowance, transactions) for each month of the ledger at
+    `path`, a JSON snapshot or a SQLite database, oldest first with the current month
+    last. Ledgers are only read: no migration, id backfill, compaction or schema upgrade.
+    """
+    data, archives = _read_sqlite_ledger(path) if path.endswith(".db") else _read_json_ledger(path)
+    for month_key in sorted(archives):
+        month = archives[month_key]
+        yield month_key, month.get("monthly_allowance", 0.0), month.get("transactions", [])
+    yield data.get("current_month"), data.get("monthly_allowance", 0.0), data.get("transactions", [])
+
+
+def import_json_to_sqlite(json_file: str, db_file: str) -> int:
+    """One-shot copy of a JSON ledger (snapshot, journal and partitions) into a SQLite database. Returns the transaction count."""
+    # The source is only read; ids it lacks are assigned in the copy
+    data, archives = _read_json_ledger(json_file)
+    data["archives"] = archives
+    missing = sum(1 for tx in data["transactions"] if not tx.get("id"))
+    if missing:
+        apply_change(data, {"op": "assign_ids", "key": "transactions", "value": [new_record_id() for _ in range(missing)]})
+    for collection in ALLOCATED_KEYS:
+        apply_change(data, {"op": "assign_ids", "key": collection, "value": _allocate_ids(data, "assign_ids", collection, None)})
+    SqliteBackend(db_file).save(data)
+    return len(data["transactions"]) + sum(len(m["transactions"]) for m in data["archives"].values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ledger storage utilities")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import-sqlite", help="Copy a JSON ledger into a SQLite database")
+    importer.add_argument("json_file", nargs="?", default=DATA_FILE)
+    importer.add_argument("db_file", nargs="?", default=SQLITE_FILE)
+    args = parser.parse_args()
+
+    count = import_json_to_sqlite(args.json_file, args.db_file)
+    print(f"Imported {count} transactions from {args.json_file} into {args.db_file}")
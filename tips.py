@@ -0,0 +1,97 @@
+"""
+Gentle financial tips shown on the Insights page.
+"""
+import random
+
+
+FINANCIAL_TIPS = [
+    "Note your expenses once a day to stay calmly aware.",
+    "Keep small, predictable snacks at home to avoid impulse buys outside.",
+    "Plan your week’s meals so food spending feels intentional.",
+    "Refill a water bottle instead of buying bottles on campus.",
+    "Use a simple spending limit for outings and stick to it comfortably.",
+    "Share subscriptions with trusted friends where allowed to reduce cost.",
+    "Schedule a weekly ‘money check-in’ that takes just 5–10 minutes.",
+    "Walk or cycle for short distances when it feels safe and practical.",
+    "Use a shopping list so you only buy what you had in mind.",
+    "Keep one low-cost comfort activity ready for stressful days.",
+    "Borrow books from the library before buying new ones.",
+    "Cook in bulk with friends and share ingredients to save gently.",
+    "Track how often you order food; small changes can add up calmly.",
+    "Keep a small emergency cushion, even if it grows slowly.",
+    "If you overspend one day, you can gently rebalance over the week.",
+    "Look for student discounts before paying full price.",
+    "Bring homemade tea or coffee when possible to reduce café trips.",
+    "Compare prices online before buying electronics or textbooks.",
+    "Set a simple monthly savings goal, even if the amount is small.",
+    "Write down your top three spending priorities for this month.",
+    "Plan social outings that don’t always revolve around spending.",
+    "Buy second-hand when it feels comfortable for you.",
+    "Use cash for some categories if it helps you feel more in control.",
+    "Pause for a few seconds before each unplanned purchase.",
+    "Unsubscribe from marketing emails that tempt you to buy more.",
+    "Set gentle limits for late-night online shopping.",
+    "Review your recurring subscriptions once a month.",
+    "Use a shared ride instead of solo cabs when it feels safe.",
+    "Try a ‘no-spend’ day occasionally to reset your habits.",
+    "Keep snacks in your bag to avoid expensive last-minute buys.",
+    "Plan ahead for exam periods when delivery spending might rise.",
+    "Split big purchases into planned, smaller monthly amounts.",
+    "Try making coffee at home most days and buying it occasionally.",
+    "Notice which days you tend to spend more, and plan ahead.",
+    "Set a calm limit for how often you use food delivery apps.",
+    "Use your allowance tracking as information, not as judgment.",
+    "Compare prices between nearby stores for everyday items.",
+    "Keep one payment method as your primary one to simplify tracking.",
+    "Add notes to your transactions so they make sense later.",
+    "Create a small ‘fun fund’ so enjoyment is part of your budget.",
+    "When you get extra income, decide its purpose before spending.",
+    "Try generic brands for a few items and see how you feel.",
+    "Keep a list of things you want and revisit it after a few days.",
+    "Celebrate small wins like sticking to your plan for a week.",
+    "If a plan doesn’t work, adjust it rather than abandoning it.",
+    "Use reminders to pay any dues on time and avoid late fees.",
+    "Talk openly with friends about low-cost hangout ideas.",
+    "Bundle small online orders to reduce delivery fees.",
+    "Prepare simple meals in advance for busy days.",
+    "Notice which purchases actually make you feel better long term.",
+    "Use campus resources (labs, gyms, libraries) wherever possible.",
+    "Take advantage of student offers on transport passes if available.",
+    "Write down upcoming events so you can plan their costs calmly.",
+    "Keep your most common categories visible to stay mindful.",
+    "Review last month’s spending for 5 minutes to spot easy tweaks.",
+    "Use your allowance tracker as a supportive tool, not a critic.",
+    "Choose one category to gently reduce this month, not all at once.",
+    "Make a simple meal plan before grocery shopping.",
+    "Avoid shopping when you’re very tired or stressed if possible.",
+    "Track cash withdrawals so you know where they are going.",
+    "Use campus printers or shared printers to save on printing costs.",
+    "Sell or donate items you don’t use and free up space and money.",
+    "When you get a gift or bonus, consider saving a small part of it.",
+    "Choose one day a week to quickly log all pending transactions.",
+    "Staying curious about your habits is more helpful than being harsh.",
+    "Ask seniors how they managed their allowance for practical ideas.",
+    "Keep big financial goals visible but flexible.",
+    "Reflect on one purchase each week that felt really worth it.",
+    "Reflect on one purchase each week that you might skip next time.",
+    "Use a simple color scheme and calm visuals for your money tools.",
+    "Give yourself permission to enjoy your allowance mindfully.",
+    "Remember that small, steady changes often beat strict rules.",
+    "Revisit your budget if your routine or semester changes.",
+    "Use this tracker to reduce surprise, not to create pressure.",
+    "Notice which subscriptions you actually use regularly.",
+    "Group similar expenses together to see clear patterns.",
+    "Set a friendly reminder near your study space to check your budget.",
+    "Track how often you take cabs versus public transport.",
+    "Plan ahead for festivals and celebrations in your budget.",
+    "Aim for progress in your financial habits, not perfection.",
+    "If you miss tracking for a few days, you can always restart calmly.",
+    "Use digital wallets mindfully; small taps can add up quietly.",
+    "Recheck your allowance amount each semester to see if it still fits.",
+    "Keep your financial notes simple enough that you enjoy using them.",
+]
+
+
+def get_random_tips(n: int = 3) -> list:
+    n = min(n, len(FINANCIAL_TIPS))
+    return random.sample(FINANCIAL_TIPS, n)